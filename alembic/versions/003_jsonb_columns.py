@@ -0,0 +1,51 @@
+"""convert json columns to jsonb with server defaults
+
+Revision ID: 003
+Revises: 9d1eba11bc7a
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '9d1eba11bc7a'
+branch_labels = None
+depends_on = None
+
+
+# (table, column, server default)
+JSON_COLUMNS = [
+    ('conversations', 'meta_data', "'{}'"),
+    ('messages', 'attachments', "'[]'"),
+    ('messages', 'meta_data', "'{}'"),
+    ('messages', 'headers', "'{}'"),
+    ('message_events', 'event_data', "'{}'"),
+    ('message_events', 'meta_data', "'{}'"),
+    ('webhook_logs', 'headers', None),
+    ('webhook_logs', 'body', None),
+    ('attachment_metadata', 'scan_result', None),
+]
+
+
+def upgrade() -> None:
+    for table, column, default in JSON_COLUMNS:
+        op.alter_column(
+            table, column,
+            type_=postgresql.JSONB(),
+            postgresql_using=f'{column}::jsonb',
+            server_default=sa.text(default) if default else None,
+        )
+
+
+def downgrade() -> None:
+    for table, column, default in JSON_COLUMNS:
+        op.alter_column(
+            table, column,
+            type_=sa.JSON(),
+            postgresql_using=f'{column}::json',
+            server_default=None,
+        )
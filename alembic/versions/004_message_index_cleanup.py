@@ -0,0 +1,27 @@
+"""replace single-column message indexes with a composite
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_messages_status', table_name='messages')
+    op.drop_index('ix_messages_direction', table_name='messages')
+    op.create_index('idx_msg_conv_status_created', 'messages', ['conversation_id', 'status', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_msg_conv_status_created', table_name='messages')
+    op.create_index('ix_messages_direction', 'messages', ['direction'])
+    op.create_index('ix_messages_status', 'messages', ['status'])
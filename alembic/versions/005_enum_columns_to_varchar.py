@@ -0,0 +1,81 @@
+"""store enum columns as varchar with check constraints
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+ENUM_VALUES = {
+    'messagetype': ('sms', 'mms', 'email'),
+    'messagedirection': ('inbound', 'outbound'),
+    'messagestatus': ('pending', 'queued', 'sending', 'sent', 'delivered', 'failed', 'retry'),
+    'conversationstatus': ('active', 'archived', 'closed'),
+    'conversationtype': ('direct', 'thread'),
+    'eventtype': ('created', 'queued', 'sent', 'delivered', 'failed', 'retry', 'webhook_received'),
+    'provider': ('twilio', 'sendgrid', 'internal', 'mock'),
+}
+
+# (table, column, enum name, server default)
+ENUM_COLUMNS = [
+    ('conversations', 'channel_type', 'messagetype', None),
+    ('conversations', 'status', 'conversationstatus', None),
+    ('conversations', 'type', 'conversationtype', 'direct'),
+    ('messages', 'provider', 'provider', None),
+    ('messages', 'direction', 'messagedirection', None),
+    ('messages', 'status', 'messagestatus', None),
+    ('messages', 'message_type', 'messagetype', None),
+    ('message_events', 'event_type', 'eventtype', None),
+    ('message_events', 'provider', 'provider', None),
+    ('webhook_logs', 'provider', 'provider', None),
+]
+
+
+def _check(column, enum_name):
+    values = ", ".join(f"'{v}'" for v in ENUM_VALUES[enum_name])
+    return f"{column} IN ({values})"
+
+
+def upgrade() -> None:
+    for table, column, enum_name, default in ENUM_COLUMNS:
+        length = max(len(v) for v in ENUM_VALUES[enum_name])
+        if default:
+            op.alter_column(table, column, server_default=None)
+        op.alter_column(
+            table, column,
+            type_=sa.String(length),
+            postgresql_using=f'{column}::text',
+        )
+        if default:
+            op.alter_column(table, column, server_default=default)
+        op.create_check_constraint(enum_name, table, _check(column, enum_name))
+
+    for enum_name in ENUM_VALUES:
+        op.execute(f'DROP TYPE IF EXISTS {enum_name}')
+
+
+def downgrade() -> None:
+    for enum_name, values in ENUM_VALUES.items():
+        sa.Enum(*values, name=enum_name).create(op.get_bind(), checkfirst=True)
+
+    for table, column, enum_name, default in ENUM_COLUMNS:
+        op.drop_constraint(enum_name, table, type_='check')
+        if default:
+            op.alter_column(table, column, server_default=None)
+        op.alter_column(
+            table, column,
+            type_=sa.Enum(*ENUM_VALUES[enum_name], name=enum_name),
+            postgresql_using=f'{column}::{enum_name}',
+        )
+        if default:
+            op.alter_column(table, column, server_default=default)
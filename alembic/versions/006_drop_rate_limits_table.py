@@ -0,0 +1,42 @@
+"""drop rate_limits table
+
+Rate limiting lives entirely in Redis; the table was never written to.
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index('idx_rate_limit_window', table_name='rate_limits')
+    op.drop_index('idx_rate_limit_client_endpoint', table_name='rate_limits')
+    op.drop_table('rate_limits')
+
+
+def downgrade() -> None:
+    op.create_table('rate_limits',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('client_id', sa.String(length=255), nullable=False),
+        sa.Column('endpoint', sa.String(length=255), nullable=False),
+        sa.Column('request_count', sa.Integer(), nullable=True, default=1),
+        sa.Column('window_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('window_end', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('client_id', 'endpoint', 'window_start', name='uq_rate_limit_window')
+    )
+    op.create_index('idx_rate_limit_client_endpoint', 'rate_limits', ['client_id', 'endpoint'])
+    op.create_index('idx_rate_limit_window', 'rate_limits', ['window_end'])
@@ -0,0 +1,27 @@
+"""add partial index on messages.parent_id
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'idx_message_parent_created', 'messages', ['parent_id', 'created_at'],
+        postgresql_where=sa.text('parent_id IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_message_parent_created', table_name='messages')
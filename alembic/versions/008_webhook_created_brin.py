@@ -0,0 +1,31 @@
+"""replace webhook_logs provider/created_at B-tree with BRIN on created_at
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-16 20:40:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index('idx_webhook_provider_created', table_name='webhook_logs')
+    op.create_index(
+        'idx_webhook_created_brin', 'webhook_logs', ['created_at'],
+        postgresql_using='brin',
+        postgresql_with={'pages_per_range': 32}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_webhook_created_brin', table_name='webhook_logs')
+    op.create_index(
+        'idx_webhook_provider_created', 'webhook_logs', ['provider', 'created_at']
+    )
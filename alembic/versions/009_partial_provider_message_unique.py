@@ -0,0 +1,32 @@
+"""make uq_provider_message a partial unique index excluding NULL ids
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-16 20:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_constraint('uq_provider_message', 'messages', type_='unique')
+    op.create_index(
+        'uq_provider_message', 'messages', ['provider', 'provider_message_id'],
+        unique=True,
+        postgresql_where=sa.text('provider_message_id IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_provider_message', table_name='messages')
+    op.create_unique_constraint(
+        'uq_provider_message', 'messages', ['provider', 'provider_message_id']
+    )
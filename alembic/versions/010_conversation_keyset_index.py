@@ -0,0 +1,27 @@
+"""add id to the conversations last_message_at index for keyset pagination
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-16 21:10:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index('idx_conversation_last_message', table_name='conversations')
+    op.create_index(
+        'idx_conversation_last_message', 'conversations', ['last_message_at', 'id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_conversation_last_message', table_name='conversations')
+    op.create_index('idx_conversation_last_message', 'conversations', ['last_message_at'])
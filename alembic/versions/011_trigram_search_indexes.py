@@ -0,0 +1,38 @@
+"""add pg_trgm GIN indexes for conversation and message search
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-16 21:40:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+_TRIGRAM_INDEXES = [
+    ('idx_conversation_from_trgm', 'conversations', 'participant_from'),
+    ('idx_conversation_to_trgm', 'conversations', 'participant_to'),
+    ('idx_conversation_title_trgm', 'conversations', 'title'),
+    ('idx_message_body_trgm', 'messages', 'body'),
+]
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in _TRIGRAM_INDEXES:
+        op.create_index(
+            name, table, [column],
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'}
+        )
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(_TRIGRAM_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,61 @@
+"""add a partial unique index for open direct conversations
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-16 22:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+_OPEN_DIRECT = "type = 'direct' AND status <> 'closed'"
+
+
+def upgrade() -> None:
+    # Message sends and receives stored participants in arrival order;
+    # sort them (code point order, as Python's sorted()) like the API does
+    op.execute("""
+        UPDATE conversations
+        SET participant_from = participant_to, participant_to = participant_from
+        WHERE type = 'direct' AND participant_from > participant_to COLLATE "C"
+    """)
+    # With no constraint since 9d1eba11bc7a, a pair may have several open
+    # direct conversations; keep the newest open one and close the rest
+    op.execute(f"""
+        UPDATE conversations SET status = 'closed'
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY participant_from, participant_to, channel_type
+                    ORDER BY created_at DESC, id DESC
+                ) AS rn
+                FROM conversations
+                WHERE {_OPEN_DIRECT}
+            ) ranked
+            WHERE rn > 1
+        )
+    """)
+    op.create_index(
+        'uq_conversation_direct', 'conversations',
+        ['participant_from', 'participant_to', 'channel_type'],
+        unique=True,
+        postgresql_where=sa.text(_OPEN_DIRECT)
+    )
+
+
+def downgrade() -> None:
+    """
+    Drop the index only.
+    
+    The data changes of upgrade() are not undone: the original participant
+    order and which duplicate conversations were open are not recorded.
+    """
+    op.drop_index('uq_conversation_direct', table_name='conversations')
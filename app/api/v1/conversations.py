@@ -12,7 +12,9 @@ from app.api.v1.models import (
     ConversationSearchRequest, ConversationStatisticsResponse, MessageResponse,
     CreateConversationRequest
 )
-from app.services.conversation_service import ConversationService
+from app.services.conversation_service import (
+    ConversationConflictError, ConversationService, encode_cursor
+)
 from app.services.message_service import MessageService
 from app.db.session import get_db
 from app.models.database import ConversationStatus, MessageType, ConversationType
@@ -137,6 +139,7 @@ async def list_conversations(
     type: Optional[ConversationType] = Query(None, description="Filter by conversation type"),
     limit: int = Query(50, ge=1, le=100, description="Number of items to return"),
     offset: int = Query(0, ge=0, description="Number of items to skip"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; replaces offset"),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -144,6 +147,7 @@ async def list_conversations(
     
     Supports filtering by participant, channel type, status, and conversation type.
     Results are paginated and ordered by last message time (newest first).
+    Pass next_cursor back as cursor to fetch the following page.
     """
     try:
         service = ConversationService(db)
@@ -154,7 +158,8 @@ async def list_conversations(
             status=status,
             type=type,
             limit=limit,
-            offset=offset
+            offset=offset,
+            cursor=cursor
         )
         
         # Convert to response models
@@ -180,9 +185,12 @@ async def list_conversations(
             conversations=conversation_responses,
             total=total,
             limit=limit,
-            offset=offset
+            offset=offset,
+            next_cursor=encode_cursor(conversations[-1]) if len(conversations) == limit else None
         )
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to list conversations: {e}")
         raise HTTPException(status_code=500, detail="Failed to list conversations")
@@ -229,6 +237,8 @@ async def update_conversation(
         
     except HTTPException:
         raise
+    except ConversationConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to update conversation: {e}")
         raise HTTPException(status_code=500, detail="Failed to update conversation")
@@ -45,10 +45,7 @@ async def health_check():
 
 
 @router.get("/ready")
-async def readiness_check(
-    response: Response,
-    db: AsyncSession = Depends(get_db)
-):
+async def readiness_check(response: Response):
     """
     Readiness probe endpoint.
     
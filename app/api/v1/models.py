@@ -207,6 +207,7 @@ class ConversationListResponse(BaseModel):
     total: int = Field(..., description="Total number of conversations")
     limit: int = Field(..., description="Current limit")
     offset: int = Field(..., description="Current offset")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, if there may be one")
 
 
 class ConversationSearchRequest(BaseModel):
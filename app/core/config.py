@@ -43,6 +43,8 @@ class Settings(BaseSettings):
     db_pool_size: int = Field(default=20, env="DB_POOL_SIZE")
     db_max_overflow: int = Field(default=40, env="DB_MAX_OVERFLOW")
     db_pool_timeout: int = Field(default=30, env="DB_POOL_TIMEOUT")
+    db_pool_recycle: int = Field(default=1800, env="DB_POOL_RECYCLE")  # Seconds before a pooled connection is replaced
+    db_prewarm: bool = Field(default=True, env="DB_PREWARM")  # Open pool_size connections on startup
     
     # Redis Settings
     redis_host: str = Field(default="localhost", env="REDIS_HOST")
@@ -55,6 +57,11 @@ class Settings(BaseSettings):
     redis_pool_size: int = Field(default=10, env="REDIS_POOL_SIZE")
     redis_pool_timeout: int = Field(default=30, env="REDIS_POOL_TIMEOUT")
     
+    # Cache Settings
+    # Writers delete the key on every change; the TTL only bounds how long an
+    # entry written by a read racing that delete can stay stale
+    conversation_cache_ttl: int = Field(default=300, env="CONVERSATION_CACHE_TTL")
+    
     # Message Queue Settings
     queue_max_retries: int = Field(default=3, env="QUEUE_MAX_RETRIES")
     queue_retry_delay: int = Field(default=60, env="QUEUE_RETRY_DELAY")
@@ -64,14 +71,18 @@ class Settings(BaseSettings):
     sms_provider_timeout: int = Field(default=30, env="SMS_PROVIDER_TIMEOUT")
     email_provider_timeout: int = Field(default=30, env="EMAIL_PROVIDER_TIMEOUT")
     provider_max_retries: int = Field(default=3, env="PROVIDER_MAX_RETRIES")
+    provider_health_interval: float = Field(default=5.0, env="PROVIDER_HEALTH_INTERVAL")  # Seconds between background health polls
+    provider_health_max_age: float = Field(default=30.0, env="PROVIDER_HEALTH_MAX_AGE")  # Cached health older than this is refreshed on demand
     
     # Rate Limiting
     rate_limit_enabled: bool = Field(default=True, env="RATE_LIMIT_ENABLED")
     rate_limit_requests: int = Field(default=100, env="RATE_LIMIT_REQUESTS")
     rate_limit_period: int = Field(default=60, env="RATE_LIMIT_PERIOD")
+    rate_limit_replicas: int = Field(default=1, env="RATE_LIMIT_REPLICAS")  # Service replicas sharing one Redis rate limit
     
     # Observability
     metrics_enabled: bool = Field(default=True, env="METRICS_ENABLED")
+    metrics_cache_ttl: float = Field(default=1.0, env="METRICS_CACHE_TTL")
     tracing_enabled: bool = Field(default=True, env="TRACING_ENABLED")
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
     log_format: str = Field(default="json", env="LOG_FORMAT")
@@ -99,6 +110,7 @@ class Settings(BaseSettings):
     provider_error_rate: float = Field(default=0, env="PROVIDER_ERROR_RATE")  # Probability of provider errors (0.0 to 1.0)
     provider_500_rate: float = Field(default=0.05, env="PROVIDER_500_RATE")  # Probability of 500 errors
     provider_429_rate: float = Field(default=0.05, env="PROVIDER_429_RATE")  # Probability of 429 rate limit errors
+    mock_simulate_latency: bool = Field(default=True, env="MOCK_SIMULATE_LATENCY")  # Mock providers sleep to imitate API round-trips
     
     @validator("database_url", pre=True)
     def assemble_db_connection(cls, v: Optional[str], values: Dict[str, Any]) -> Any:
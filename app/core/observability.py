@@ -2,10 +2,14 @@
 Observability module providing structured logging, metrics collection, and distributed tracing.
 """
 
+import asyncio
+import hashlib
 import logging
 import time
 import json
-from typing import Dict, Any, Optional, Callable
+import uuid
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Callable, Iterable
 from functools import wraps
 from contextlib import contextmanager
 from datetime import datetime
@@ -14,6 +18,8 @@ from prometheus_client import (
     Counter, Histogram, Gauge, Summary,
     generate_latest, CollectorRegistry, CONTENT_TYPE_LATEST
 )
+from prometheus_client.core import GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
 from opentelemetry import trace
 from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.sdk.resources import Resource
@@ -25,31 +31,59 @@ from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
 from app.core.config import settings
 
 
+# Correlation ID of the request being handled; set by CorrelationIdMiddleware
+_CID: ContextVar[str] = ContextVar("correlation_id")
+
+
+def add_correlation_id(logger, method_name, event_dict):
+    """Structlog processor adding the current request's correlation ID."""
+    event_dict["correlation_id"] = _CID.get("-")
+    return event_dict
+
+
+# Structlog processor chain, built once at import rather than per setup call.
+# Level filtering is handled by the bound logger class, so filter_by_level is
+# not needed here.
+_PROCESSORS = (
+    structlog.stdlib.add_logger_name,
+    structlog.stdlib.add_log_level,
+    add_correlation_id,
+    structlog.processors.TimeStamper(fmt="iso"),
+    structlog.processors.StackInfoRenderer(),
+    structlog.processors.format_exc_info,
+    structlog.processors.UnicodeDecoder(),
+)
+
+# Walks the call stack on every record, so it is only enabled at DEBUG level
+_CALLSITE_PROCESSOR = structlog.processors.CallsiteParameterAdder(
+    parameters=[
+        structlog.processors.CallsiteParameter.FILENAME,
+        structlog.processors.CallsiteParameter.FUNC_NAME,
+        structlog.processors.CallsiteParameter.LINENO,
+    ]
+)
+
+# Renderers for each log format, picked when logging is set up
+_JSON_RENDERER = structlog.processors.JSONRenderer()
+_CONSOLE_RENDERER = structlog.dev.ConsoleRenderer()
+
+
 # Initialize structured logging
 def setup_logging():
     """Configure structured logging with correlation IDs."""
+    log_level = getattr(logging, settings.log_level.upper())
+    
+    processors = list(_PROCESSORS)
+    if log_level == logging.DEBUG:
+        processors.append(_CALLSITE_PROCESSOR)
+    processors.append(structlog.processors.dict_tracebacks)
+    processors.append(_JSON_RENDERER if settings.log_format == "json" else _CONSOLE_RENDERER)
     
-    # Configure structlog
+    # Configure structlog; applied on every call so a later setup (e.g. each
+    # app lifespan) picks up changed log settings
     structlog.configure(
-        processors=[
-            structlog.stdlib.filter_by_level,
-            structlog.stdlib.add_logger_name,
-            structlog.stdlib.add_log_level,
-            structlog.stdlib.PositionalArgumentsFormatter(),
-            structlog.processors.TimeStamper(fmt="iso"),
-            structlog.processors.StackInfoRenderer(),
-            structlog.processors.format_exc_info,
-            structlog.processors.UnicodeDecoder(),
-            structlog.processors.CallsiteParameterAdder(
-                parameters=[
-                    structlog.processors.CallsiteParameter.FILENAME,
-                    structlog.processors.CallsiteParameter.FUNC_NAME,
-                    structlog.processors.CallsiteParameter.LINENO,
-                ]
-            ),
-            structlog.processors.dict_tracebacks,
-            structlog.processors.JSONRenderer() if settings.log_format == "json" else structlog.dev.ConsoleRenderer()
-        ],
+        processors=processors,
+        wrapper_class=structlog.make_filtering_bound_logger(log_level),
         context_class=dict,
         logger_factory=structlog.stdlib.LoggerFactory(),
         cache_logger_on_first_use=True,
@@ -58,14 +92,14 @@ def setup_logging():
     # Set log level
     logging.basicConfig(
         format="%(message)s",
-        level=getattr(logging, settings.log_level.upper())
+        level=log_level
     )
 
 
 # Get logger instance
-def get_logger(name: str) -> structlog.BoundLogger:
-    """Get a structured logger instance."""
-    return structlog.get_logger(name)
+def get_logger(name: str, **initial_values: Any) -> structlog.BoundLogger:
+    """Get a structured logger instance, optionally pre-bound with context."""
+    return structlog.get_logger(name, **initial_values)
 
 
 # Metrics Registry
@@ -114,12 +148,31 @@ queue_depth_gauge = Gauge(
     registry=registry
 )
 
-db_connection_pool = Gauge(
-    'database_connection_pool_size',
-    'Database connection pool metrics',
-    ['metric_type'],  # active, idle, overflow
-    registry=registry
-)
+
+class _PoolCollector(Collector):
+    """Reports database connection pool usage, read from the pool at scrape time."""
+    
+    def collect(self) -> Iterable[Metric]:
+        from app.db.session import db_manager
+        
+        gauge = GaugeMetricFamily(
+            'database_connection_pool_size',
+            'Database connection pool metrics',
+            labels=['metric_type']  # active, idle, overflow
+        )
+        
+        pool = db_manager.engine.pool if db_manager.engine else None
+        # Only queue-based pools track checkouts (not NullPool/StaticPool)
+        if pool is not None and hasattr(pool, "checkedout"):
+            gauge.add_metric(['active'], pool.checkedout())
+            gauge.add_metric(['idle'], pool.checkedin())
+            gauge.add_metric(['overflow'], pool.overflow())
+        
+        yield gauge
+
+
+registry.register(_PoolCollector())
+
 
 cache_operations = Counter(
     'cache_operations_total',
@@ -143,6 +196,10 @@ rate_limit_hits = Counter(
 )
 
 
+# Last rendered metrics payload as (monotonic timestamp, payload, ETag)
+_last_render: Optional[tuple[float, bytes, str]] = None
+
+
 class MetricsCollector:
     """Collects and exposes application metrics."""
     
@@ -160,9 +217,9 @@ class MetricsCollector:
     @contextmanager
     def track_duration(msg_type: str, provider: str):
         """Track operation duration."""
-        start = time.time()
+        start = time.perf_counter_ns()
         yield
-        duration = time.time() - start
+        duration = (time.perf_counter_ns() - start) / 1e9
         message_duration.labels(
             message_type=msg_type,
             provider=provider
@@ -208,9 +265,30 @@ class MetricsCollector:
         rate_limit_hits.labels(client=client, endpoint=endpoint).inc()
     
     @staticmethod
-    def get_metrics() -> bytes:
-        """Get metrics in Prometheus format."""
-        return generate_latest(registry)
+    def get_metrics(max_age: Optional[float] = None) -> tuple[bytes, str]:
+        """
+        Get metrics in Prometheus format.
+        
+        Renders are reused for up to ``max_age`` seconds (default
+        ``settings.metrics_cache_ttl``) so back-to-back scrapes from several
+        Prometheus replicas don't re-walk every collector.
+        
+        Returns:
+            Tuple of (payload, ETag)
+        """
+        global _last_render
+        
+        if max_age is None:
+            max_age = settings.metrics_cache_ttl
+        
+        now = time.monotonic()
+        if _last_render is not None and now - _last_render[0] < max_age:
+            return _last_render[1], _last_render[2]
+        
+        payload = generate_latest(registry)
+        etag = f'"{hashlib.blake2b(payload, digest_size=8).hexdigest()}"'
+        _last_render = (now, payload, etag)
+        return payload, etag
 
 
 # Tracing Setup
@@ -251,14 +329,15 @@ def setup_tracing():
 def trace_operation(name: str):
     """Decorator to trace function execution."""
     def decorator(func: Callable) -> Callable:
+        span_attributes = {"function.name": func.__name__}
+        
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
             if not tracer:
                 return await func(*args, **kwargs)
             
-            with tracer.start_as_current_span(name) as span:
+            with tracer.start_as_current_span(name, attributes=span_attributes) as span:
                 try:
-                    span.set_attribute("function.name", func.__name__)
                     result = await func(*args, **kwargs)
                     span.set_status(trace.Status(trace.StatusCode.OK))
                     return result
@@ -274,9 +353,8 @@ def trace_operation(name: str):
             if not tracer:
                 return func(*args, **kwargs)
             
-            with tracer.start_as_current_span(name) as span:
+            with tracer.start_as_current_span(name, attributes=span_attributes) as span:
                 try:
-                    span.set_attribute("function.name", func.__name__)
                     result = func(*args, **kwargs)
                     span.set_status(trace.Status(trace.StatusCode.OK))
                     return result
@@ -288,7 +366,6 @@ def trace_operation(name: str):
                     raise
         
         # Return appropriate wrapper based on function type
-        import asyncio
         if asyncio.iscoroutinefunction(func):
             return async_wrapper
         return sync_wrapper
@@ -304,23 +381,25 @@ class CorrelationIdMiddleware:
     
     async def __call__(self, scope, receive, send):
         if scope["type"] == "http":
-            import uuid
             correlation_id = str(uuid.uuid4())
             
-            # Add to context
-            structlog.contextvars.bind_contextvars(
-                correlation_id=correlation_id
-            )
+            # Add to context; the token gives an O(1) reset once the request ends
+            token = _CID.set(correlation_id)
             
             # Add to response headers
             async def send_wrapper(message):
                 if message["type"] == "http.response.start":
-                    headers = dict(message.get("headers", []))
-                    headers[b"x-correlation-id"] = correlation_id.encode()
-                    message["headers"] = list(headers.items())
+                    # Append rather than round-trip through a dict, which would
+                    # collapse repeated headers such as Set-Cookie
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-correlation-id", correlation_id.encode()))
+                    message["headers"] = headers
                 await send(message)
             
-            await self.app(scope, receive, send_wrapper)
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                _CID.reset(token)
         else:
             await self.app(scope, receive, send)
 
@@ -334,39 +413,41 @@ class HealthMonitor:
     
     def register_check(self, name: str, check_func: Callable):
         """Register a health check."""
-        self.checks[name] = check_func
+        # Resolve sync vs async once here instead of on every health probe
+        self.checks[name] = (check_func, asyncio.iscoroutinefunction(check_func))
     
     async def check_health(self) -> Dict[str, Any]:
-        """Run all health checks."""
+        """Run all health checks concurrently."""
         results = {
             "status": "healthy",
             "timestamp": datetime.utcnow().isoformat(),
             "checks": {}
         }
         
-        for name, check_func in self.checks.items():
-            try:
-                # Handle both sync and async functions
-                import asyncio
-                if asyncio.iscoroutinefunction(check_func):
-                    result = await check_func()
-                else:
-                    result = check_func()
-                
-                results["checks"][name] = {
-                    "status": "healthy" if result else "unhealthy",
-                    "result": result
-                }
-                
-                if not result:
-                    results["status"] = "unhealthy"
-                    
-            except Exception as e:
+        names = list(self.checks)
+        coros = [
+            check_func() if is_async else asyncio.to_thread(check_func)
+            for check_func, is_async in self.checks.values()
+        ]
+        outcomes = await asyncio.gather(*coros, return_exceptions=True)
+        
+        for name, result in zip(names, outcomes):
+            # BaseException too: a cancelled check comes back as CancelledError
+            if isinstance(result, BaseException):
                 results["checks"][name] = {
                     "status": "unhealthy",
-                    "error": str(e)
+                    "error": str(result)
                 }
                 results["status"] = "unhealthy"
+                continue
+            
+            results["checks"][name] = {
+                "status": "healthy" if result else "unhealthy",
+                "result": result
+            }
+            
+            if not result:
+                results["status"] = "unhealthy"
         
         return results
 
@@ -379,18 +460,22 @@ health_monitor = HealthMonitor()
 def monitor_performance(operation_name: str):
     """Decorator to monitor function performance."""
     def decorator(func: Callable) -> Callable:
+        # Lazy proxy bound once with the operation; resolved on first call so
+        # it picks up the configuration applied by setup_logging
+        logger = get_logger(func.__module__, operation=operation_name)
+        completed_event = f"{operation_name} completed"
+        failed_event = f"{operation_name} failed"
+        
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            logger = get_logger(__name__)
-            start_time = time.time()
+            start_time = time.perf_counter_ns()
             
             try:
                 result = await func(*args, **kwargs)
-                duration = time.time() - start_time
+                duration = (time.perf_counter_ns() - start_time) / 1e9
                 
                 logger.info(
-                    f"{operation_name} completed",
-                    operation=operation_name,
+                    completed_event,
                     duration=duration,
                     status="success"
                 )
@@ -398,11 +483,10 @@ def monitor_performance(operation_name: str):
                 return result
                 
             except Exception as e:
-                duration = time.time() - start_time
+                duration = (time.perf_counter_ns() - start_time) / 1e9
                 
                 logger.error(
-                    f"{operation_name} failed",
-                    operation=operation_name,
+                    failed_event,
                     duration=duration,
                     status="error",
                     error=str(e)
@@ -411,16 +495,14 @@ def monitor_performance(operation_name: str):
         
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            logger = get_logger(__name__)
-            start_time = time.time()
+            start_time = time.perf_counter_ns()
             
             try:
                 result = func(*args, **kwargs)
-                duration = time.time() - start_time
+                duration = (time.perf_counter_ns() - start_time) / 1e9
                 
                 logger.info(
-                    f"{operation_name} completed",
-                    operation=operation_name,
+                    completed_event,
                     duration=duration,
                     status="success"
                 )
@@ -428,11 +510,10 @@ def monitor_performance(operation_name: str):
                 return result
                 
             except Exception as e:
-                duration = time.time() - start_time
+                duration = (time.perf_counter_ns() - start_time) / 1e9
                 
                 logger.error(
-                    f"{operation_name} failed",
-                    operation=operation_name,
+                    failed_event,
                     duration=duration,
                     status="error",
                     error=str(e)
@@ -440,7 +521,6 @@ def monitor_performance(operation_name: str):
                 raise
         
         # Return appropriate wrapper
-        import asyncio
         if asyncio.iscoroutinefunction(func):
             return async_wrapper
         return sync_wrapper
@@ -2,10 +2,10 @@
 Redis connection management for caching, rate limiting, and message queuing.
 """
 
-import json
 import logging
-from typing import Optional, Any, Dict, List
+from typing import Optional, Any, Dict, List, Tuple
 from datetime import timedelta
+import orjson
 import redis.asyncio as redis
 from redis.exceptions import RedisError
 from contextlib import asynccontextmanager
@@ -14,6 +14,44 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Serialization options shared by every cache/queue/pub-sub write
+_DUMPS_OPTS = orjson.OPT_NON_STR_KEYS
+
+def _dumps(value: Any) -> bytes:
+    """Serialize a value to JSON bytes."""
+    return orjson.dumps(value, option=_DUMPS_OPTS)
+
+
+def _stream_fields(message: Dict[str, Any]) -> Dict[str, bytes]:
+    """
+    Stream fields for a queue message.
+    
+    The whole message is kept in a single JSON ``data`` field so values
+    keep their types on read and every consumer version can decode it.
+    """
+    return {"data": _dumps(message)}
+
+
+# Sliding-window rate limit, evaluated atomically in one round-trip.
+# KEYS[1] = window key, ARGV[1] = window (ms), ARGV[2] = hits to record.
+# Members are server time in microseconds plus a hit index, so concurrent
+# requests in the same millisecond are all counted.
+_RATE_LIMIT_LUA = """
+local key = KEYS[1]
+local window_ms = tonumber(ARGV[1])
+local hits = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now_ms = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local stamp = t[1] .. string.format('%06d', tonumber(t[2]))
+redis.call('ZREMRANGEBYSCORE', key, 0, now_ms - window_ms)
+for i = 1, hits do
+    redis.call('ZADD', key, now_ms, stamp .. ':' .. i)
+end
+local count = redis.call('ZCARD', key)
+redis.call('PEXPIRE', key, window_ms + 1000)
+return count
+"""
+
 
 class RedisManager:
     """Manages Redis connections and operations."""
@@ -21,7 +59,7 @@ class RedisManager:
     def __init__(self):
         """Initialize Redis manager."""
         self.redis_client: Optional[redis.Redis] = None
-        self.pubsub: Optional[redis.client.PubSub] = None
+        self._rate_limit_script = None
         
     async def init_redis(self):
         """Initialize Redis connection pool."""
@@ -48,24 +86,23 @@ class RedisManager:
                 }
             
             self.redis_client = redis.Redis(**redis_params)
+            self._rate_limit_script = None
             
             # Test connection
             await self.redis_client.ping()
             logger.info("Redis connection initialized successfully")
             
-            # Initialize pub/sub
-            self.pubsub = self.redis_client.pubsub()
-            
         except RedisError as e:
             logger.error(f"Failed to initialize Redis: {e}")
             raise
     
     async def close(self):
         """Close Redis connections."""
-        if self.pubsub:
-            await self.pubsub.close()
         if self.redis_client:
             await self.redis_client.close()
+            # Later calls skip Redis instead of reusing a pool whose
+            # connections belong to a loop that may be gone
+            self.redis_client = None
             logger.info("Redis connections closed")
     
     # Cache Operations
@@ -85,9 +122,9 @@ class RedisManager:
         try:
             value = await self.redis_client.get(key)
             if value:
-                return json.loads(value)
+                return orjson.loads(value)
             return None
-        except (RedisError, json.JSONDecodeError) as e:
+        except (RedisError, orjson.JSONDecodeError) as e:
             logger.error(f"Error getting cache key {key}: {e}")
             return None
     
@@ -112,7 +149,7 @@ class RedisManager:
             logger.warning("Redis not initialized, skipping set operation")
             return False
         try:
-            serialized = json.dumps(value)
+            serialized = _dumps(value)
             if ttl:
                 await self.redis_client.setex(key, ttl, serialized)
             else:
@@ -163,7 +200,8 @@ class RedisManager:
         self,
         key: str,
         limit: int,
-        window: int
+        window: int,
+        hits: int = 1
     ) -> tuple[bool, int]:
         """
         Check rate limit using sliding window.
@@ -172,27 +210,17 @@ class RedisManager:
             key: Rate limit key
             limit: Maximum requests
             window: Time window in seconds
+            hits: Number of requests to record (batched local counts)
             
         Returns:
             Tuple of (allowed, remaining)
         """
         try:
-            pipe = self.redis_client.pipeline()
-            now = await self.redis_client.time()
-            now_ms = now[0] * 1000 + now[1] // 1000
-            window_ms = window * 1000
+            # Registered lazily: EVALSHA, falling back to loading the script
+            if self._rate_limit_script is None:
+                self._rate_limit_script = self.redis_client.register_script(_RATE_LIMIT_LUA)
             
-            # Remove old entries
-            pipe.zremrangebyscore(key, 0, now_ms - window_ms)
-            # Add current request
-            pipe.zadd(key, {str(now_ms): now_ms})
-            # Count requests in window
-            pipe.zcard(key)
-            # Set expiry
-            pipe.expire(key, window + 1)
-            
-            results = await pipe.execute()
-            count = results[2]
+            count = await self._rate_limit_script(keys=[key], args=[window * 1000, hits])
             
             allowed = count <= limit
             remaining = max(0, limit - count)
@@ -213,6 +241,8 @@ class RedisManager:
         """
         Add message to queue using Redis Streams.
         
+        The message is serialized into a single ``data`` stream field.
+        
         Args:
             queue: Queue name
             message: Message data
@@ -221,14 +251,37 @@ class RedisManager:
             Message ID
         """
         try:
-            # Convert message to flat dict for Redis Streams
-            flat_message = {"data": json.dumps(message)}
-            message_id = await self.redis_client.xadd(queue, flat_message)
+            message_id = await self.redis_client.xadd(queue, _stream_fields(message))
             return message_id
         except (RedisError, TypeError, ValueError) as e:
             logger.error(f"Error enqueuing message to {queue}: {e}")
             raise
     
+    async def enqueue_message_with_depth(
+        self,
+        queue: str,
+        message: Dict[str, Any]
+    ) -> Tuple[str, int]:
+        """
+        Add message to queue and read the queue length in one round trip.
+        
+        Args:
+            queue: Queue name
+            message: Message data, encoded as in enqueue_message()
+            
+        Returns:
+            Tuple of (message ID, queue length after the add)
+        """
+        try:
+            async with self.pipeline() as pipe:
+                pipe.xadd(queue, _stream_fields(message))
+                pipe.xlen(queue)
+                message_id, depth = await pipe.execute()
+            return message_id, depth
+        except (RedisError, TypeError, ValueError) as e:
+            logger.error(f"Error enqueuing message to {queue}: {e}")
+            raise
+    
     async def dequeue_messages(
         self,
         queue: str,
@@ -267,7 +320,7 @@ class RedisManager:
                     # Handle both bytes and string keys (depends on decode_responses setting)
                     data_value = data.get("data") or data.get(b"data")
                     if data_value:
-                        message_data = json.loads(data_value)
+                        message_data = orjson.loads(data_value)
                         message_data["_id"] = message_id
                         result.append(message_data)
                         # Update last read ID for this queue
@@ -275,7 +328,7 @@ class RedisManager:
             
             return result
             
-        except (RedisError, json.JSONDecodeError) as e:
+        except (RedisError, orjson.JSONDecodeError) as e:
             logger.error(f"Error dequeuing messages from {queue}: {e}")
             return []
     
@@ -323,26 +376,75 @@ class RedisManager:
             logger.warning("Redis not initialized, skipping publish operation")
             return 0
         try:
-            serialized = json.dumps(message)
+            serialized = _dumps(message)
             return await self.redis_client.publish(channel, serialized)
         except (RedisError, TypeError, ValueError) as e:
             logger.error(f"Error publishing to channel {channel}: {e}")
             return 0
     
+    def pipeline(self):
+        """
+        Get a non-transactional pipeline.
+        
+        Commands queued on it are sent together by ``execute()`` in a
+        single round trip, without MULTI/EXEC.
+        """
+        return self.redis_client.pipeline(transaction=False)
+    
+    async def delete_and_publish(
+        self,
+        key: str,
+        channel: str,
+        message: Dict[str, Any]
+    ) -> int:
+        """
+        Invalidate a cache entry and publish a change event in one round trip.
+        
+        Args:
+            key: Cache key to delete
+            channel: Channel name
+            message: Message data
+            
+        Returns:
+            Number of subscribers that received the message
+        """
+        if not self.redis_client:
+            logger.warning("Redis not initialized, skipping delete and publish operation")
+            return 0
+        try:
+            async with self.pipeline() as pipe:
+                pipe.delete(key)
+                pipe.publish(channel, _dumps(message))
+                _, receivers = await pipe.execute()
+            return receivers
+        except (RedisError, TypeError, ValueError) as e:
+            logger.error(f"Error deleting {key} and publishing to {channel}: {e}")
+            return 0
+    
     async def subscribe(
         self,
         channels: List[str]
-    ):
+    ) -> redis.client.PubSub:
         """
         Subscribe to channels.
         
+        Each call gets its own PubSub handle so unrelated subscribers don't
+        share one connection and read loop. The caller owns the handle and
+        must close it when done.
+        
         Args:
             channels: List of channel names
+            
+        Returns:
+            PubSub handle subscribed to the channels
         """
+        pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
         try:
-            await self.pubsub.subscribe(*channels)
+            await pubsub.subscribe(*channels)
             logger.info(f"Subscribed to channels: {channels}")
+            return pubsub
         except RedisError as e:
+            await pubsub.close()
             logger.error(f"Error subscribing to channels: {e}")
             raise
     
@@ -3,9 +3,11 @@ Database session management and initialization.
 Provides async database sessions with connection pooling.
 """
 
+import asyncio
 from typing import AsyncGenerator
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.pool import NullPool, QueuePool
+from sqlalchemy.pool import NullPool, QueuePool, AsyncAdaptedQueuePool
 from sqlalchemy.orm import sessionmaker
 from contextlib import asynccontextmanager
 import logging
@@ -26,24 +28,37 @@ class DatabaseManager:
         
     def init_db(self):
         """Initialize database engine and session factory."""
+        # Resolve the URL once; settings may be overridden after import (tests)
+        url = str(settings.database_url)
+        
         # Build engine kwargs, excluding pool parameters for SQLite
         engine_kwargs = {
             "echo": settings.debug,
+            # Compiled SQL cache per engine; sized for the lambda statements
+            # plus the filter combinations of the list endpoints
+            "query_cache_size": 1200,
         }
         
         # Only add pool parameters for non-SQLite databases
-        if not str(settings.database_url).startswith("sqlite"):
+        if not url.startswith("sqlite"):
             engine_kwargs.update({
+                # asyncio-native queue: a released connection is handed
+                # straight to the oldest waiting checkout
+                "poolclass": AsyncAdaptedQueuePool,
+                # Idle connections are reused most-recent-first, so a few
+                # hot connections serve steady load and the rest sit idle
+                # long enough for pool_recycle/pre-ping to retire them
+                "pool_use_lifo": True,
                 "pool_size": settings.db_pool_size,
                 "max_overflow": settings.db_max_overflow,
                 "pool_timeout": settings.db_pool_timeout,
                 "pool_pre_ping": True,  # Verify connections before using
-                "pool_recycle": 3600,  # Recycle connections after 1 hour
+                "pool_recycle": settings.db_pool_recycle,  # Replace connections before server/proxy idle timeouts
             })
         
         # Create async engine with connection pooling
         self.engine = create_async_engine(
-            str(settings.database_url),
+            url,
             **engine_kwargs
         )
         
@@ -58,6 +73,43 @@ class DatabaseManager:
         
         logger.info("Database engine initialized successfully")
     
+    async def prewarm(self):
+        """
+        Fill the connection pool before serving traffic.
+        
+        Opens pool_size connections concurrently and runs a real round-trip
+        on each, so the first burst of requests doesn't pay for connect,
+        TLS and auth. Connections are then returned to the pool idle.
+        """
+        if self.engine.dialect.name == "sqlite":
+            return
+        
+        async def open_connection():
+            conn = await self.engine.connect()
+            try:
+                await conn.execute(text("SELECT 1"))
+            except Exception:
+                await conn.close()
+                raise
+            return conn
+        
+        # Hold every connection until all are open so each one is distinct
+        results = await asyncio.gather(
+            *(open_connection() for _ in range(settings.db_pool_size)),
+            return_exceptions=True
+        )
+        
+        warmed = 0
+        for result in results:
+            # BaseException too: a startup timeout cancels the pending opens
+            if isinstance(result, BaseException):
+                logger.warning(f"Database pool pre-warm connection failed: {result}")
+                continue
+            await result.close()
+            warmed += 1
+        
+        logger.info(f"Database pool pre-warmed with {warmed} connections")
+    
     async def create_tables(self):
         """Create all database tables."""
         async with self.engine.begin() as conn:
@@ -70,23 +122,6 @@ class DatabaseManager:
             await conn.run_sync(Base.metadata.drop_all)
             logger.info("Database tables dropped successfully")
     
-    async def get_session(self) -> AsyncGenerator[AsyncSession, None]:
-        """
-        Get an async database session.
-        
-        Yields:
-            AsyncSession: Database session
-        """
-        async with self.async_session_factory() as session:
-            try:
-                yield session
-                await session.commit()
-            except Exception:
-                await session.rollback()
-                raise
-            finally:
-                await session.close()
-    
     @asynccontextmanager
     async def session_context(self) -> AsyncSession:
         """
@@ -119,7 +154,6 @@ class DatabaseManager:
             bool: True if database is healthy
         """
         try:
-            from sqlalchemy import text
             async with self.engine.begin() as conn:
                 result = await conn.execute(text("SELECT 1"))
                 return result.scalar() == 1
@@ -136,17 +170,28 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency for FastAPI to get database session.
     
+    Opens the session directly from the factory: this runs on every
+    request, so it avoids wrapping a second generator. Leaving the
+    ``async with`` block closes the session.
+    
     Yields:
         AsyncSession: Database session
     """
-    async for session in db_manager.get_session():
-        yield session
+    async with db_manager.async_session_factory() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
 
 
 async def init_database():
     """Initialize database on application startup."""
     db_manager.init_db()
     await db_manager.create_tables()
+    if settings.db_prewarm:
+        await db_manager.prewarm()
     logger.info("Database initialized successfully")
 
 
@@ -4,11 +4,14 @@ Main FastAPI application with API endpoints for the messaging service.
 
 from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST
 from contextlib import asynccontextmanager
 from typing import List, Optional, Dict, Any
+import os
 import time
 import logging
+import orjson
 
 from app.core.config import settings
 from app.core.observability import (
@@ -25,6 +28,123 @@ from app.api import legacy_routes
 
 logger = get_logger(__name__)
 
+# Static config read on every request, snapshotted once at import
+_API_PREFIX = settings.api_prefix
+_RL_ENABLED = settings.rate_limit_enabled
+_RL_LIMIT = settings.rate_limit_requests
+_RL_WINDOW = settings.rate_limit_period
+_RL_LIMIT_HEADER = str(_RL_LIMIT)
+_RL_WINDOW_HEADER = str(_RL_WINDOW)
+_RL_LIMIT_HEADER_BYTES = _RL_LIMIT_HEADER.encode()
+_RL_WINDOW_HEADER_BYTES = _RL_WINDOW_HEADER.encode()
+_LOG_LEVEL = getattr(logging, settings.log_level.upper())
+_LOG_REQUESTS_RECEIVED = _LOG_LEVEL <= logging.DEBUG
+_LOG_REQUESTS_COMPLETED = _LOG_LEVEL <= logging.INFO
+
+# Error bodies are fixed, so serialize them once
+_500_BODY = orjson.dumps(ErrorResponse(
+    error="Internal server error",
+    message="An unexpected error occurred"
+).model_dump())
+_404_BODY = orjson.dumps(ErrorResponse(
+    error="Not found",
+    message="The requested resource was not found"
+).model_dump())
+_429_BODY = orjson.dumps(ErrorResponse(
+    error="Rate limit exceeded",
+    message="Too many requests. Please try again later."
+).model_dump())
+_429_HEADERS = {
+    "X-RateLimit-Limit": _RL_LIMIT_HEADER,
+    "X-RateLimit-Remaining": "0",
+    "X-RateLimit-Reset": _RL_WINDOW_HEADER
+}
+
+# Probe, scrape and docs paths: never rate limited, and only logged on errors
+_NO_RL_PATHS = frozenset({
+    "/", "/metrics", "/health", "/healthz", "/ready", "/live", "/startup",
+    "/docs", "/redoc", "/openapi.json",
+})
+
+def _server_workers() -> int:
+    """
+    Number of server processes in this replica sharing the rate limit.
+    
+    Read from WEB_CONCURRENCY, which uvicorn also honours for its worker
+    count and which __main__ below exports; a plain ``uvicorn app.main:app``
+    (the Docker image) runs one process.
+    """
+    return max(int(os.environ.get("WEB_CONCURRENCY", "1")), 1)
+
+
+def _local_threshold(processes: int) -> int:
+    """Per-process share of the local rate limit allowance."""
+    return int(_RL_LIMIT * 0.8 / processes)
+
+
+# Every server process in every replica keeps its own count against the
+# same Redis window. WEB_CONCURRENCY only covers this replica, so a
+# deployment running N replicas sets RATE_LIMIT_REPLICAS=N; left at 1,
+# N replicas together admit up to N times the local allowance before Redis
+# sees the client
+_RL_LOCAL_PROCESSES = _server_workers() * max(settings.rate_limit_replicas, 1)
+# Below this many requests per window a client is admitted from the
+# in-process count alone, without a Redis round-trip. The allowance is
+# split between the processes: together they admit at most 80% of the
+# limit before Redis sees the client
+_RL_LOCAL_THRESHOLD = _local_threshold(_RL_LOCAL_PROCESSES)
+# Remaining requests reported on the local path, less this process's count:
+# assumes every other process has used its whole share
+_RL_LOCAL_REMAINING = _RL_LIMIT - (_RL_LOCAL_PROCESSES - 1) * _RL_LOCAL_THRESHOLD
+_RL_LOCAL_MAX_KEYS = 100_000
+# Windows dropped at once when the table is full, oldest first
+_RL_LOCAL_EVICT = _RL_LOCAL_MAX_KEYS // 10
+
+# rate limit key -> [request count, window start (monotonic), count synced to Redis,
+# last Redis check (monotonic)]; keys are kept in window start order, oldest first
+_local_rate_counts: Dict[str, list] = {}
+
+
+def _evict_local_rate_counts(now: float) -> None:
+    """Make room in _local_rate_counts: drop expired windows, then the oldest live ones."""
+    stale = []
+    for key, entry in _local_rate_counts.items():
+        if now - entry[1] < _RL_WINDOW and len(stale) >= _RL_LOCAL_EVICT:
+            break
+        stale.append(key)
+    for key in stale:
+        del _local_rate_counts[key]
+
+
+def _count_local_request(key: str, now: float) -> tuple[list, int]:
+    """
+    Count a request against the in-process window for key.
+    
+    Returns:
+        Tuple of (window entry, hits from the expired window that were
+        never reported to Redis)
+    """
+    entry = _local_rate_counts.get(key)
+    carried = 0
+    
+    if entry is None or now - entry[1] >= _RL_WINDOW:
+        if entry is not None:
+            # Hits older than one window have already left Redis's window
+            if now - entry[1] < 2 * _RL_WINDOW:
+                carried = entry[0] - entry[2]
+            # Re-inserted below, at the end with the newest windows
+            del _local_rate_counts[key]
+            last_check = entry[3]
+        else:
+            if len(_local_rate_counts) >= _RL_LOCAL_MAX_KEYS:
+                _evict_local_rate_counts(now)
+            last_check = float("-inf")
+        entry = _local_rate_counts[key] = [0, now, 0, last_check]
+    
+    # No await between read and write, so this is atomic on the event loop
+    entry[0] += 1
+    return entry, carried
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -58,14 +178,16 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down messaging service...")
     
-    # Close providers
-    await ProviderFactory.close_providers()
-    
-    # Close Redis
-    await close_redis()
-    
-    # Close database
-    await close_database()
+    # Run every step even if an earlier one fails, so nothing is left open
+    for name, close in (
+        ("providers", ProviderFactory.close_providers),
+        ("Redis", close_redis),
+        ("database", close_database),
+    ):
+        try:
+            await close()
+        except Exception as e:
+            logger.error(f"Failed to close {name}: {e}")
     
     logger.info("Messaging service shut down successfully")
 
@@ -77,6 +199,7 @@ app = FastAPI(
     description="Unified messaging API for SMS, MMS, Email",
     docs_url="/docs" if settings.debug else None,
     redoc_url="/redoc" if settings.debug else None,
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -89,136 +212,181 @@ app.add_middleware(
     allow_headers=settings.cors_allow_headers,
 )
 
-# Add correlation ID middleware
-app.add_middleware(CorrelationIdMiddleware)
-
 
-# Middleware for request logging and metrics
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log and track all HTTP requests."""
-    start_time = time.time()
+async def _check_rate_limit(client_id: str, path: str) -> tuple[bool, int]:
+    """Count a request for client_id on path and decide whether to admit it."""
+    key = f"rate_limit:{client_id}:{path}"
+    now = time.monotonic()
+    entry, carried = _count_local_request(key, now)
     
-    # Log request
-    logger.info(
-        "Request received",
-        method=request.method,
-        path=request.url.path,
-        client=request.client.host if request.client else None
+    # Local only while well under the limit, with nothing left to report
+    # and no hits this process sent to Redis still inside its window
+    if not carried and entry[0] < _RL_LOCAL_THRESHOLD and now - entry[3] >= _RL_WINDOW:
+        return True, _RL_LOCAL_REMAINING - entry[0]
+    
+    # Consult Redis, reporting every request counted locally since the
+    # last sync, including any left over from the expired window
+    hits = entry[0] - entry[2] + carried
+    entry[2] = entry[0]
+    entry[3] = now
+    return await redis_manager.check_rate_limit(
+        key=key,
+        limit=_RL_LIMIT,
+        window=_RL_WINDOW,
+        hits=hits
     )
+
+
+class RequestMiddleware:
+    """
+    Rate limiting, request logging and API metrics in one ASGI middleware.
+    
+    Works on the raw scope/receive/send triple instead of two
+    BaseHTTPMiddleware layers, each of which built a Request, ran the rest
+    of the stack in a separate task and wrapped the response.
+    """
+    
+    def __init__(self, app):
+        self.app = app
     
-    try:
-        response = await call_next(request)
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Calculate duration
-        duration = time.time() - start_time
+        path = scope["path"]
+        method = scope["method"]
+        client = scope.get("client")
+        client_host = client[0] if client else None
+        quiet = path in _NO_RL_PATHS
         
-        # Track metrics
-        MetricsCollector.track_api_request(
-            method=request.method,
-            endpoint=request.url.path,
-            status_code=response.status_code,
-            duration=duration
-        )
+        rate_headers = None
+        if _RL_ENABLED and not quiet:
+            # Get client identifier (IP or API key)
+            client_id = client_host or "unknown"
+            allowed, remaining = await _check_rate_limit(client_id, path)
+            
+            if not allowed:
+                MetricsCollector.track_rate_limit(client_id, path)
+                response = Response(
+                    _429_BODY,
+                    status_code=429,
+                    media_type="application/json",
+                    headers=_429_HEADERS
+                )
+                await response(scope, receive, send)
+                return
+            
+            rate_headers = (
+                (b"x-ratelimit-limit", _RL_LIMIT_HEADER_BYTES),
+                (b"x-ratelimit-remaining", str(remaining).encode()),
+                (b"x-ratelimit-reset", _RL_WINDOW_HEADER_BYTES),
+            )
         
-        # Log response
-        logger.info(
-            "Request completed",
-            method=request.method,
-            path=request.url.path,
-            status_code=response.status_code,
-            duration=duration
-        )
+        start_time = time.perf_counter_ns()
         
-        return response
+        # "Request completed" carries the same fields, so only trace arrivals
+        # when debugging
+        if _LOG_REQUESTS_RECEIVED and not quiet:
+            logger.debug(
+                "Request received",
+                method=method,
+                path=path,
+                client=client_host
+            )
         
-    except Exception as e:
-        duration = time.time() - start_time
+        status_code = 500
+        response_started = False
         
-        logger.error(
-            "Request failed",
-            method=request.method,
-            path=request.url.path,
-            error=str(e),
-            duration=duration
-        )
+        async def send_wrapper(message):
+            nonlocal status_code, response_started
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_started = True
+                if rate_headers:
+                    message["headers"] = [*message.get("headers", ()), *rate_headers]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            duration = (time.perf_counter_ns() - start_time) / 1e9
+            
+            logger.error(
+                "Request failed",
+                method=method,
+                path=path,
+                error=str(e),
+                duration=duration
+            )
+            
+            # Track error metric
+            MetricsCollector.track_api_request(
+                method=method,
+                endpoint=path,
+                status_code=500,
+                duration=duration
+            )
+            
+            if response_started:
+                raise
+            
+            response = Response(_500_BODY, status_code=500, media_type="application/json")
+            await response(scope, receive, send_wrapper)
+            return
         
-        # Track error metric
+        duration = (time.perf_counter_ns() - start_time) / 1e9
+        
+        # Track metrics
         MetricsCollector.track_api_request(
-            method=request.method,
-            endpoint=request.url.path,
-            status_code=500,
+            method=method,
+            endpoint=path,
+            status_code=status_code,
             duration=duration
         )
         
-        return JSONResponse(
-            status_code=500,
-            content=ErrorResponse(
-                error="Internal server error",
-                message="An unexpected error occurred"
-            ).dict()
+        # Log response (quiet paths only when something went wrong;
+        # 304s from cached /metrics scrapes are not worth a line)
+        if quiet and status_code < 400:
+            return
+        
+        # Skip building the event dict when INFO is filtered out anyway
+        if not _LOG_REQUESTS_COMPLETED:
+            return
+        
+        logger.info(
+            "Request completed",
+            method=method,
+            path=path,
+            status_code=status_code,
+            duration=duration
         )
 
 
-# Rate limiting middleware
-@app.middleware("http")
-async def rate_limit_middleware(request: Request, call_next):
-    """Apply rate limiting to API requests."""
-    if not settings.rate_limit_enabled:
-        return await call_next(request)
-    
-    # Get client identifier (IP or API key)
-    client_id = request.client.host if request.client else "unknown"
-    endpoint = request.url.path
-    
-    # Check rate limit
-    allowed, remaining = await redis_manager.check_rate_limit(
-        key=f"rate_limit:{client_id}:{endpoint}",
-        limit=settings.rate_limit_requests,
-        window=settings.rate_limit_period
-    )
-    
-    if not allowed:
-        MetricsCollector.track_rate_limit(client_id, endpoint)
-        
-        return JSONResponse(
-            status_code=429,
-            content=ErrorResponse(
-                error="Rate limit exceeded",
-                message=f"Too many requests. Please try again later."
-            ).dict(),
-            headers={
-                "X-RateLimit-Limit": str(settings.rate_limit_requests),
-                "X-RateLimit-Remaining": "0",
-                "X-RateLimit-Reset": str(settings.rate_limit_period)
-            }
-        )
-    
-    # Add rate limit headers
-    response = await call_next(request)
-    response.headers["X-RateLimit-Limit"] = str(settings.rate_limit_requests)
-    response.headers["X-RateLimit-Remaining"] = str(remaining)
-    response.headers["X-RateLimit-Reset"] = str(settings.rate_limit_period)
-    
-    return response
+# Rate limiting, request logging and metrics
+app.add_middleware(RequestMiddleware)
+
+# Add correlation ID middleware (outermost), so request logs and the 429/500
+# responses built by RequestMiddleware carry the ID too
+app.add_middleware(CorrelationIdMiddleware)
 
 
 # Include API routers
 app.include_router(
     messages.router,
-    prefix=f"{settings.api_prefix}/messages",
+    prefix=f"{_API_PREFIX}/messages",
     tags=["messages"]
 )
 
 app.include_router(
     conversations.router,
-    prefix=f"{settings.api_prefix}/conversations",
+    prefix=f"{_API_PREFIX}/conversations",
     tags=["conversations"]
 )
 
 app.include_router(
     webhooks.router,
-    prefix=f"{settings.api_prefix}/webhooks",
+    prefix=f"{_API_PREFIX}/webhooks",
     tags=["webhooks"]
 )
 
@@ -248,7 +416,7 @@ async def root():
 
 # Metrics endpoint
 @app.get("/metrics", response_class=PlainTextResponse)
-async def metrics():
+async def metrics(request: Request):
     """Prometheus metrics endpoint."""
     if not settings.metrics_enabled:
         raise HTTPException(
@@ -256,7 +424,17 @@ async def metrics():
             detail="Metrics not enabled"
         )
     
-    return MetricsCollector.get_metrics()
+    payload, etag = MetricsCollector.get_metrics()
+    
+    # Scraper already has this exact payload
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    return Response(
+        content=payload,
+        media_type=CONTENT_TYPE_LATEST,
+        headers={"ETag": etag}
+    )
 
 
 # Global exception handler
@@ -271,36 +449,34 @@ async def global_exception_handler(request: Request, exc: Exception):
         exc_info=True
     )
     
-    return JSONResponse(
-        status_code=500,
-        content=ErrorResponse(
-            error="Internal server error",
-            message="An unexpected error occurred"
-        ).dict()
-    )
+    return Response(_500_BODY, status_code=500, media_type="application/json")
 
 
 # 404 handler
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc):
     """Handle 404 errors."""
-    return JSONResponse(
-        status_code=404,
-        content=ErrorResponse(
-            error="Not found",
-            message=f"The requested resource was not found"
-        ).dict()
-    )
+    return Response(_404_BODY, status_code=404, media_type="application/json")
 
 
 if __name__ == "__main__":
     import uvicorn
     
+    workers = settings.workers if not settings.debug else 1
+    # Worker processes inherit this and size their rate limit share from it
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    
     uvicorn.run(
         "app.main:app",
         host=settings.host,
         port=settings.port,
         reload=settings.debug,
-        workers=settings.workers if not settings.debug else 1,
-        log_level=settings.log_level.lower()
+        workers=workers,
+        log_level=settings.log_level.lower(),
+        # C event loop and HTTP parser (uvicorn[standard]); fail fast if missing
+        loop="uvloop",
+        http="httptools",
+        backlog=2048,
+        # Longer than typical client/LB idle timeouts, so connections are reused
+        timeout_keep_alive=75
     )
@@ -7,7 +7,6 @@ from app.models.database import (
     MessageEvent,
     WebhookLog,
     AttachmentMetadata,
-    RateLimitEntry,
     MessageType,
     MessageDirection,
     MessageStatus,
@@ -23,7 +22,6 @@ __all__ = [
     "MessageEvent",
     "WebhookLog",
     "AttachmentMetadata",
-    "RateLimitEntry",
     "MessageType",
     "MessageDirection",
     "MessageStatus",
@@ -5,17 +5,56 @@ Defines the core entities: Conversation, Message, MessageEvent, and related mode
 
 from sqlalchemy import (
     Column, String, DateTime, ForeignKey, Text, JSON, Enum, Index, 
-    UniqueConstraint, CheckConstraint, Boolean, Integer, Float, TypeDecorator
+    CheckConstraint, Boolean, Integer, Float, TypeDecorator
 )
-from sqlalchemy.dialects.postgresql import UUID as PG_UUID
-from sqlalchemy.types import CHAR
-from sqlalchemy.orm import relationship, declarative_base
-from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PG_UUID
+from sqlalchemy.types import BINARY
+from sqlalchemy.orm import relationship, deferred, DeclarativeBase
+from sqlalchemy.sql import func, text
+from sqlalchemy import DDL, event
 import enum
+import os
+import time
 import uuid
 
 
-Base = declarative_base()
+class Base(DeclarativeBase):
+    """Declarative base for all models.
+
+    ``metadata`` is reserved here for the table registry, which is why the
+    JSON metadata columns are mapped as ``meta_data``.
+    """
+
+
+# JSONB on PostgreSQL (binary storage, GIN-indexable), plain JSON elsewhere
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
+# Empty-document defaults are rendered by the database, so every row gets its
+# own value instead of sharing one Python dict/list across inserts.
+EMPTY_OBJECT = text("'{}'")
+EMPTY_ARRAY = text("'[]'")
+
+# Predicate of the uq_conversation_direct partial unique index
+OPEN_DIRECT_CONVERSATION = text("type = 'direct' AND status <> 'closed'")
+
+
+# Substring search (ILIKE '%q%') is served by pg_trgm GIN indexes on
+# PostgreSQL; the extension must exist before those indexes are created
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+
+def trigram_index(name: str, column: str) -> Index:
+    """GIN trigram index for ILIKE searches; PostgreSQL only."""
+    return Index(
+        name,
+        column,
+        postgresql_using="gin",
+        postgresql_ops={column: "gin_trgm_ops"},
+    ).ddl_if(dialect="postgresql")
 
 
 # UUID type compatible with both PostgreSQL and SQLite
@@ -23,16 +62,16 @@ class UUID(TypeDecorator):
     """Platform-independent UUID type.
     
     Uses PostgreSQL's UUID type if available, otherwise uses
-    CHAR(36), storing UUIDs as strings.
+    BINARY(16), storing the raw UUID bytes.
     """
-    impl = CHAR
+    impl = BINARY
     cache_ok = True
     
     def load_dialect_impl(self, dialect):
         if dialect.name == "postgresql":
             return dialect.type_descriptor(PG_UUID())
         else:
-            return dialect.type_descriptor(CHAR(36))
+            return dialect.type_descriptor(BINARY(16))
     
     def process_bind_param(self, value, dialect):
         if value is None:
@@ -41,18 +80,54 @@ class UUID(TypeDecorator):
             return str(value)
         else:
             if isinstance(value, uuid.UUID):
-                return str(value)
+                return value.bytes
             else:
-                return str(uuid.UUID(value))
+                return uuid.UUID(value).bytes
     
     def process_result_value(self, value, dialect):
         if value is None:
             return value
+        elif isinstance(value, uuid.UUID):
+            return value
+        elif isinstance(value, bytes):
+            return uuid.UUID(bytes=value)
         else:
-            if isinstance(value, uuid.UUID):
-                return value
-            else:
-                return uuid.UUID(value)
+            return uuid.UUID(value)
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Generate a time-ordered UUID (RFC 9562 version 7).
+    
+    48-bit Unix millisecond timestamp followed by random bits, so new
+    primary keys land at the right edge of the B-tree instead of on a
+    random leaf page.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return uuid.UUID(int=value)
+
+
+def _enum_values(enum_cls):
+    """Persist enum members by value rather than by name."""
+    return [e.value for e in enum_cls]
+
+
+def StrEnumType(enum_cls):
+    """
+    Store a str enum by value in a VARCHAR with a CHECK constraint.
+    
+    Avoids a native PostgreSQL ENUM type per enum, so adding a member is a
+    constraint change rather than an ALTER TYPE. Attributes still load as
+    enum members.
+    """
+    return Enum(
+        enum_cls,
+        values_callable=_enum_values,
+        native_enum=False,
+        create_constraint=True,
+    )
 
 
 class MessageType(str, enum.Enum):
@@ -116,18 +191,18 @@ class Conversation(Base):
     """
     __tablename__ = "conversations"
     
-    id = Column(UUID, primary_key=True, default=uuid.uuid4)
+    id = Column(UUID, primary_key=True, default=uuid7)
     participant_from = Column(String(255), nullable=True, index=True)
     participant_to = Column(String(255), nullable=True, index=True)
-    channel_type = Column(Enum(MessageType, values_callable=lambda x: [e.value for e in x]), nullable=False, index=True)
+    channel_type = Column(StrEnumType(MessageType), nullable=False, index=True)
     status = Column(
-        Enum(ConversationStatus, values_callable=lambda x: [e.value for e in x]), 
+        StrEnumType(ConversationStatus), 
         default=ConversationStatus.ACTIVE,
         nullable=False,
         index=True
     )
     type = Column(
-        Enum(ConversationType, values_callable=lambda x: [e.value for e in x]),
+        StrEnumType(ConversationType),
         default=ConversationType.DIRECT,
         nullable=False,
         server_default="direct"
@@ -140,7 +215,7 @@ class Conversation(Base):
     unread_count = Column(Integer, default=0)
     
     # JSON metadata for extensibility
-    meta_data = Column(JSON, default={})
+    meta_data = Column(JSONType, server_default=EMPTY_OBJECT)
     
     # Timestamps
     created_at = Column(
@@ -155,7 +230,8 @@ class Conversation(Base):
         nullable=False
     )
     
-    # Relationships
+    # Relationships (lazy loads fail under AsyncSession, so queries that
+    # need these collections request them with selectinload()/joinedload())
     messages = relationship(
         "Message",
         back_populates="conversation",
@@ -171,12 +247,23 @@ class Conversation(Base):
             "participant_to",
             "channel_type"
         ),
-        Index("idx_conversation_last_message", "last_message_at"),
-        UniqueConstraint(
+        # Scanned backwards for list_conversations' keyset order; id breaks
+        # ties so every page boundary is a single index position
+        Index("idx_conversation_last_message", "last_message_at", "id"),
+        trigram_index("idx_conversation_from_trgm", "participant_from"),
+        trigram_index("idx_conversation_to_trgm", "participant_to"),
+        trigram_index("idx_conversation_title_trgm", "title"),
+        # One open direct conversation per participant pair; closed ones
+        # and threads are not indexed, so a closed pair can start afresh.
+        # Also the ON CONFLICT target of create_conversation
+        Index(
+            "uq_conversation_direct",
             "participant_from",
-            "participant_to", 
+            "participant_to",
             "channel_type",
-            name="uq_conversation_participants"
+            unique=True,
+            postgresql_where=OPEN_DIRECT_CONVERSATION,
+            sqlite_where=OPEN_DIRECT_CONVERSATION
         ),
     )
     
@@ -190,7 +277,7 @@ class Message(Base):
     """
     __tablename__ = "messages"
     
-    id = Column(UUID, primary_key=True, default=uuid.uuid4)
+    id = Column(UUID, primary_key=True, default=uuid7)
     conversation_id = Column(
         UUID,
         ForeignKey("conversations.id", ondelete="CASCADE"),
@@ -203,22 +290,21 @@ class Message(Base):
     )
     
     # Provider information
-    provider = Column(Enum(Provider, values_callable=lambda x: [e.value for e in x]), nullable=False)
+    provider = Column(StrEnumType(Provider), nullable=False)
     provider_message_id = Column(String(255))
     
     # Message details
-    direction = Column(Enum(MessageDirection, values_callable=lambda x: [e.value for e in x]), nullable=False, index=True)
+    direction = Column(StrEnumType(MessageDirection), nullable=False)
     status = Column(
-        Enum(MessageStatus, values_callable=lambda x: [e.value for e in x]),
+        StrEnumType(MessageStatus),
         default=MessageStatus.PENDING,
-        nullable=False,
-        index=True
+        nullable=False
     )
-    message_type = Column(Enum(MessageType, values_callable=lambda x: [e.value for e in x]), nullable=False)
+    message_type = Column(StrEnumType(MessageType), nullable=False)
     
     # Content
     body = Column(Text)
-    attachments = Column(JSON, default=[])
+    attachments = Column(JSONType, server_default=EMPTY_ARRAY)
     
     # Participant information (denormalized for query performance)
     from_address = Column(String(255), nullable=False)
@@ -230,17 +316,19 @@ class Message(Base):
     retry_after = Column(DateTime(timezone=True))
     
     # Tracking
+    # Write-only columns are deferred: loading a message skips them and
+    # reading one afterwards needs an explicit undefer()
     sent_at = Column(DateTime(timezone=True))
     delivered_at = Column(DateTime(timezone=True))
-    failed_at = Column(DateTime(timezone=True))
-    error_message = Column(Text)
+    failed_at = deferred(Column(DateTime(timezone=True)))
+    error_message = deferred(Column(Text))
     
     # Metadata
-    meta_data = Column(JSON, default={})
-    headers = Column(JSON, default={})
+    meta_data = Column(JSONType, server_default=EMPTY_OBJECT)
+    headers = deferred(Column(JSONType, server_default=EMPTY_OBJECT))
     
     # Cost tracking (for future billing features)
-    cost = Column(Float, default=0.0)
+    cost = deferred(Column(Float, default=0.0))
     
     # Timestamps
     created_at = Column(
@@ -268,11 +356,26 @@ class Message(Base):
     # Indexes - optimized for API query patterns
     __table_args__ = (
         Index("idx_message_conversation_created", "conversation_id", "created_at"),
+        Index("idx_msg_conv_status_created", "conversation_id", "status", "created_at"),
+        # Thread replies; also backs the parent_id ON DELETE CASCADE lookup.
+        # Partial, since most messages have no parent
+        Index(
+            "idx_message_parent_created",
+            "parent_id",
+            "created_at",
+            postgresql_where=text("parent_id IS NOT NULL")
+        ),
+        # Also serves status-only lookups via its left prefix
         Index("idx_message_status_retry", "status", "retry_after"),
-        UniqueConstraint(
+        trigram_index("idx_message_body_trgm", "body"),
+        # Outbound messages have no provider id until sent; leaving those
+        # rows out keeps the dedupe index to delivered/received messages
+        Index(
+            "uq_provider_message",
             "provider",
             "provider_message_id",
-            name="uq_provider_message"
+            unique=True,
+            postgresql_where=text("provider_message_id IS NOT NULL")
         ),
         CheckConstraint("retry_count >= 0", name="check_retry_count_positive"),
     )
@@ -287,23 +390,23 @@ class MessageEvent(Base):
     """
     __tablename__ = "message_events"
     
-    id = Column(UUID, primary_key=True, default=uuid.uuid4)
+    id = Column(UUID, primary_key=True, default=uuid7)
     message_id = Column(
         UUID,
         ForeignKey("messages.id", ondelete="CASCADE"),
         nullable=False
     )
     
-    event_type = Column(Enum(EventType, values_callable=lambda x: [e.value for e in x]), nullable=False)
-    event_data = Column(JSON, default={})
+    event_type = Column(StrEnumType(EventType), nullable=False)
+    event_data = Column(JSONType, server_default=EMPTY_OBJECT)
     
     # Provider tracking
-    provider = Column(Enum(Provider, values_callable=lambda x: [e.value for e in x]))
+    provider = Column(StrEnumType(Provider))
     provider_event_id = Column(String(255))
     provider_timestamp = Column(DateTime(timezone=True))
     
     # Event metadata
-    meta_data = Column(JSON, default={})
+    meta_data = Column(JSONType, server_default=EMPTY_OBJECT)
     error_message = Column(Text)
     
     # Timestamp
@@ -331,15 +434,15 @@ class WebhookLog(Base):
     """
     __tablename__ = "webhook_logs"
     
-    id = Column(UUID, primary_key=True, default=uuid.uuid4)
-    provider = Column(Enum(Provider, values_callable=lambda x: [e.value for e in x]), nullable=False)
+    id = Column(UUID, primary_key=True, default=uuid7)
+    provider = Column(StrEnumType(Provider), nullable=False)
     webhook_id = Column(String(255))
     
     # Request information
     endpoint = Column(String(255))
     method = Column(String(10))
-    headers = Column(JSON)
-    body = Column(JSON)
+    headers = Column(JSONType)
+    body = Column(JSONType)
     
     # Processing information
     processed = Column(Boolean, default=False)
@@ -353,9 +456,15 @@ class WebhookLog(Base):
         nullable=False
     )
     
-    # Indexes - optimized for auditing and debugging
+    # Indexes - optimized for auditing and debugging. The log is append-only,
+    # so created_at follows physical row order and a BRIN index covers the
+    # time-range scans at a fraction of a B-tree's size and insert cost
     __table_args__ = (
-        Index("idx_webhook_provider_created", "provider", "created_at"),
+        Index(
+            "idx_webhook_created_brin", "created_at",
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": 32}
+        ),
     )
     
     def __repr__(self):
@@ -368,7 +477,7 @@ class AttachmentMetadata(Base):
     """
     __tablename__ = "attachment_metadata"
     
-    id = Column(UUID, primary_key=True, default=uuid.uuid4)
+    id = Column(UUID, primary_key=True, default=uuid7)
     message_id = Column(
         UUID,
         ForeignKey("messages.id", ondelete="CASCADE"),
@@ -388,7 +497,7 @@ class AttachmentMetadata(Base):
     
     # Security
     scanned = Column(Boolean, default=False)
-    scan_result = Column(JSON)
+    scan_result = Column(JSONType)
     
     # Timestamps
     created_at = Column(
@@ -400,47 +509,3 @@ class AttachmentMetadata(Base):
     
     def __repr__(self):
         return f"<AttachmentMetadata(id={self.id}, file_name={self.file_name})>"
-
-
-class RateLimitEntry(Base):
-    """
-    Track rate limiting per client/endpoint.
-    """
-    __tablename__ = "rate_limits"
-    
-    id = Column(UUID, primary_key=True, default=uuid.uuid4)
-    client_id = Column(String(255), nullable=False)
-    endpoint = Column(String(255), nullable=False)
-    
-    # Rate limit tracking
-    request_count = Column(Integer, default=1)
-    window_start = Column(DateTime(timezone=True), nullable=False)
-    window_end = Column(DateTime(timezone=True), nullable=False)
-    
-    # Timestamps
-    created_at = Column(
-        DateTime(timezone=True),
-        server_default=func.now(),
-        nullable=False
-    )
-    updated_at = Column(
-        DateTime(timezone=True),
-        server_default=func.now(),
-        onupdate=func.now(),
-        nullable=False
-    )
-    
-    # Indexes for future rate limiting
-    __table_args__ = (
-        Index("idx_rate_limit_client_endpoint", "client_id", "endpoint"),
-        Index("idx_rate_limit_window", "window_end"),
-        UniqueConstraint(
-            "client_id",
-            "endpoint",
-            "window_start",
-            name="uq_rate_limit_window"
-        ),
-    )
-    
-    def __repr__(self):
-        return f"<RateLimitEntry(client={self.client_id}, endpoint={self.endpoint})>"
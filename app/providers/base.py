@@ -4,12 +4,14 @@ Supports SMS/MMS (Twilio), Email (SendGrid), and extensible for Voice/Voicemail.
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List
-from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable
+from datetime import datetime, timezone
+from types import MappingProxyType
 import asyncio
+import os
+import time
 import httpx
 import random
-from tenacity import retry, stop_after_attempt, wait_exponential
 from circuitbreaker import circuit
 
 from app.core.observability import get_logger, MetricsCollector, trace_operation
@@ -49,6 +51,72 @@ class ProviderServerError(ProviderError):
         super().__init__(message, 500, provider)
 
 
+def _provider_message_id(prefix: str, now_ns: int) -> str:
+    """
+    Build a mock provider message id.
+    
+    Nanosecond time in fixed-width hex followed by 80 random bits: ids sort
+    by creation time and don't collide within the same clock tick.
+    """
+    return f"{prefix}_{now_ns:016x}{os.urandom(10).hex()}"
+
+
+_SEND_ATTEMPTS = 3
+# Exponential backoff between attempts: 2 ** (attempt - 1) seconds,
+# clamped to [min, max] (the old tenacity wait_exponential(min=4, max=10))
+_SEND_RETRY_MIN_DELAY = 4  # seconds
+_SEND_RETRY_MAX_DELAY = 10  # seconds
+
+
+async def _send_with_retry(
+    send_once: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+    message_data: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Call a provider's single-attempt send, retrying provider 5xx errors.
+    
+    Rate limits and other errors propagate at
+    once so the caller can honour retry_after through the retry queue. The
+    success path is one await with no retry state.
+    """
+    for attempt in range(1, _SEND_ATTEMPTS):
+        try:
+            return await send_once(message_data)
+        except ProviderServerError:
+            await asyncio.sleep(
+                min(max(2 ** (attempt - 1), _SEND_RETRY_MIN_DELAY), _SEND_RETRY_MAX_DELAY)
+            )
+    # Last attempt: a server error now propagates to the caller
+    return await send_once(message_data)
+
+
+# One connection pool shared by every provider; created on first use
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the shared provider HTTP client, creating it if needed.
+    
+    Returns:
+        httpx.AsyncClient with a keep-alive connection pool
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100)
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared provider HTTP client."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
 class MessageProvider(ABC):
     """Abstract base class for message providers."""
     
@@ -89,15 +157,9 @@ class TwilioProvider(MessageProvider):
     def __init__(self):
         self.name = Provider.TWILIO
         self.base_url = "https://api.twilio.com"  # Not actually used (mock)
-        self.timeout = settings.sms_provider_timeout
-        self.client = httpx.AsyncClient(timeout=self.timeout)
+        self.timeout = settings.sms_provider_timeout  # Pass per request on the shared client
+        self.client = get_http_client()
         
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
-    )
-    @circuit(failure_threshold=5, recovery_timeout=60)
-    @trace_operation("twilio_send_message")
     async def send_message(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Send SMS/MMS through Twilio (MOCK).
@@ -113,8 +175,14 @@ class TwilioProvider(MessageProvider):
             
         Raises:
             ProviderRateLimitError: When simulating 429 rate limit
-            ProviderServerError: When simulating 500 server error
+            ProviderServerError: When simulating 500 server error on every attempt
         """
+        return await _send_with_retry(self._send_once, message_data)
+    
+    @circuit(failure_threshold=5, recovery_timeout=60)
+    @trace_operation("twilio_send_message")
+    async def _send_once(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Make one send attempt."""
         try:
             with MetricsCollector.track_duration(
                 message_data["type"],
@@ -122,7 +190,8 @@ class TwilioProvider(MessageProvider):
             ):
                 # MOCK: Simulate network delay (no actual API call)
                 # In production, this would make actual API call
-                await asyncio.sleep(0.1)
+                if settings.mock_simulate_latency:
+                    await asyncio.sleep(0.1)
                 
                 # MOCK: Simulate provider errors based on configuration
                 if settings.provider_error_rate > 0:
@@ -151,10 +220,12 @@ class TwilioProvider(MessageProvider):
                         )
  
                 # MOCK: Return hardcoded success response
+                # One clock read serves both the id and the timestamp
+                now_ns = time.time_ns()
                 response = {
-                    "provider_message_id": f"twilio_{datetime.utcnow().timestamp()}",
+                    "provider_message_id": _provider_message_id("twilio", now_ns),
                     "status": "sent",
-                    "timestamp": datetime.utcnow().isoformat(),
+                    "timestamp": datetime.fromtimestamp(now_ns / 1e9, tz=timezone.utc).isoformat(),
                     "cost": 0.01 if message_data["type"] == "sms" else 0.02
                 }
                 
@@ -196,11 +267,12 @@ class TwilioProvider(MessageProvider):
         """
         try:
             # MOCK: Simulate API delay
-            await asyncio.sleep(0.05)
+            if settings.mock_simulate_latency:
+                await asyncio.sleep(0.05)
             # MOCK: Return hardcoded delivered status
             return {
                 "status": "delivered",
-                "delivered_at": datetime.utcnow().isoformat()
+                "delivered_at": datetime.now(timezone.utc).isoformat()
             }
         except Exception as e:
             logger.error(f"Failed to get status from Twilio (MOCK): {e}")
@@ -246,14 +318,11 @@ class TwilioProvider(MessageProvider):
         """
         try:
             # MOCK: Simulate health check
-            await asyncio.sleep(0.01)
+            if settings.mock_simulate_latency:
+                await asyncio.sleep(0.01)
             return True
         except Exception:
             return False
-    
-    async def close(self):
-        """Close HTTP client."""
-        await self.client.aclose()
 
 
 class SendGridProvider(MessageProvider):
@@ -267,15 +336,9 @@ class SendGridProvider(MessageProvider):
     def __init__(self):
         self.name = Provider.SENDGRID
         self.base_url = "https://api.sendgrid.com"  # Not actually used (mock)
-        self.timeout = settings.email_provider_timeout
-        self.client = httpx.AsyncClient(timeout=self.timeout)
+        self.timeout = settings.email_provider_timeout  # Pass per request on the shared client
+        self.client = get_http_client()
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
-    )
-    @circuit(failure_threshold=5, recovery_timeout=60)
-    @trace_operation("sendgrid_send_message")
     async def send_message(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Send email through SendGrid (MOCK).
@@ -291,12 +354,19 @@ class SendGridProvider(MessageProvider):
             
         Raises:
             ProviderRateLimitError: When simulating 429 rate limit
-            ProviderServerError: When simulating 500 server error
+            ProviderServerError: When simulating 500 server error on every attempt
         """
+        return await _send_with_retry(self._send_once, message_data)
+    
+    @circuit(failure_threshold=5, recovery_timeout=60)
+    @trace_operation("sendgrid_send_message")
+    async def _send_once(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Make one send attempt."""
         try:
             with MetricsCollector.track_duration("email", self.name.value):
                 # MOCK: Simulate network delay (no actual API call)
-                await asyncio.sleep(0.15)
+                if settings.mock_simulate_latency:
+                    await asyncio.sleep(0.15)
                 
                 # MOCK: Simulate provider errors based on configuration
                 if settings.provider_error_rate > 0:
@@ -325,10 +395,12 @@ class SendGridProvider(MessageProvider):
                         )
                 
                 # MOCK: Return hardcoded success response
+                # One clock read serves both the id and the timestamp
+                now_ns = time.time_ns()
                 response = {
-                    "provider_message_id": f"sendgrid_{datetime.utcnow().timestamp()}",
+                    "provider_message_id": _provider_message_id("sendgrid", now_ns),
                     "status": "sent",
-                    "timestamp": datetime.utcnow().isoformat(),
+                    "timestamp": datetime.fromtimestamp(now_ns / 1e9, tz=timezone.utc).isoformat(),
                     "cost": 0.001
                 }
                 
@@ -370,11 +442,12 @@ class SendGridProvider(MessageProvider):
         """
         try:
             # MOCK: Simulate API delay
-            await asyncio.sleep(0.05)
+            if settings.mock_simulate_latency:
+                await asyncio.sleep(0.05)
             # MOCK: Return hardcoded delivered status
             return {
                 "status": "delivered",
-                "delivered_at": datetime.utcnow().isoformat()
+                "delivered_at": datetime.now(timezone.utc).isoformat()
             }
         except Exception as e:
             logger.error(f"Failed to get status from SendGrid (MOCK): {e}")
@@ -420,14 +493,19 @@ class SendGridProvider(MessageProvider):
         """
         try:
             # MOCK: Simulate health check
-            await asyncio.sleep(0.01)
+            if settings.mock_simulate_latency:
+                await asyncio.sleep(0.01)
             return True
         except Exception:
             return False
-    
-    async def close(self):
-        """Close HTTP client."""
-        await self.client.aclose()
+
+
+# Default provider for each message type; read-only, built once at import
+_PROVIDER_BY_TYPE = MappingProxyType({
+    MessageType.SMS: "twilio",
+    MessageType.MMS: "twilio",
+    MessageType.EMAIL: "sendgrid",
+})
 
 
 class ProviderFactory:
@@ -435,6 +513,11 @@ class ProviderFactory:
     
     _providers: Dict[str, MessageProvider] = {}
     
+    # provider type -> (healthy, time.monotonic() of the check); written by
+    # the health poller, read by ProviderSelector without awaiting
+    _health: Dict[str, Tuple[bool, float]] = {}
+    _health_task: Optional[asyncio.Task] = None
+    
     @classmethod
     def register_provider(cls, provider_type: str, provider: MessageProvider):
         """Register a provider."""
@@ -452,21 +535,15 @@ class ProviderFactory:
         Returns:
             Message provider instance
         """
-        provider_map = {
-            MessageType.SMS: "twilio",
-            MessageType.MMS: "twilio",
-            MessageType.EMAIL: "sendgrid"
-        }
-        
-        provider_type = provider_map.get(message_type)
-        if not provider_type:
-            raise ValueError(f"No provider for message type: {message_type}")
-        
-        provider = cls._providers.get(provider_type)
-        if not provider:
-            raise ValueError(f"Provider not registered: {provider_type}")
+        try:
+            provider_type = _PROVIDER_BY_TYPE[message_type]
+        except KeyError:
+            raise ValueError(f"No provider for message type: {message_type}") from None
         
-        return provider
+        try:
+            return cls._providers[provider_type]
+        except KeyError:
+            raise ValueError(f"Provider not registered: {provider_type}") from None
     
     @classmethod
     async def init_providers(cls):
@@ -475,15 +552,66 @@ class ProviderFactory:
         cls.register_provider("twilio", TwilioProvider())
         cls.register_provider("sendgrid", SendGridProvider())
         
+        # Seed the cache so the first sends don't miss, then keep it fresh
+        await cls.refresh_health()
+        if cls._health_task is None or cls._health_task.done():
+            cls._health_task = asyncio.create_task(cls._poll_health())
+        
         logger.info("All providers initialized")
     
+    @classmethod
+    async def check_health(cls, provider_type: str) -> bool:
+        """
+        Run one provider's health check and cache the result.
+        
+        Args:
+            provider_type: Registered provider key
+            
+        Returns:
+            True if the provider is healthy
+        """
+        try:
+            healthy = await cls._providers[provider_type].health_check()
+        except Exception as e:
+            logger.error(f"Provider health check failed: {provider_type}: {e}")
+            healthy = False
+        cls._health[provider_type] = (healthy, time.monotonic())
+        return healthy
+    
+    @classmethod
+    async def refresh_health(cls):
+        """Check every registered provider concurrently."""
+        await asyncio.gather(*(cls.check_health(provider_type) for provider_type in list(cls._providers)))
+    
+    @classmethod
+    async def _poll_health(cls):
+        """Refresh cached provider health in the background."""
+        while True:
+            await asyncio.sleep(settings.provider_health_interval)
+            await cls.refresh_health()
+    
     @classmethod
     async def close_providers(cls):
         """Close all provider connections."""
+        task = cls._health_task
+        if task is not None:
+            task.cancel()
+            # A task started on another event loop can't be awaited here;
+            # cancelling it is all that's possible
+            if task.get_loop() is asyncio.get_running_loop():
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+            cls._health_task = None
+        cls._health.clear()
+        
         for provider_type, provider in cls._providers.items():
             if hasattr(provider, "close"):
                 await provider.close()
                 logger.info(f"Closed provider: {provider_type}")
+        
+        await close_http_client()
 
 
 class ProviderSelector:
@@ -513,8 +641,15 @@ class ProviderSelector:
         
         provider = ProviderFactory.get_provider(message_type)
         
-        # Check provider health
-        if not await provider.health_check():
+        # Use the poller's cached health; only check inline if it is stale
+        provider_type = provider.name.value
+        cached = ProviderFactory._health.get(provider_type)
+        if cached is None or time.monotonic() - cached[1] > settings.provider_health_max_age:
+            healthy = await ProviderFactory.check_health(provider_type)
+        else:
+            healthy = cached[0]
+        
+        if not healthy:
             logger.warning(f"Provider unhealthy: {provider.name}")
             # In production, fallback to backup provider
         
@@ -2,18 +2,31 @@
 Conversation service for managing message conversations.
 """
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
+from types import MappingProxyType
+import asyncio
+import base64
+import hashlib
 import uuid
-from sqlalchemy import select, and_, or_, func, desc
+import orjson
+from sqlalchemy import (
+    Select, Update, Delete, select, update, delete, and_, or_, func, desc, tuple_, literal,
+    union_all, lambda_stmt
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, class_mapper
 
 from app.models.database import (
-    Conversation, Message, ConversationStatus, MessageType, ConversationType
+    Conversation, Message, ConversationStatus, MessageType, ConversationType,
+    OPEN_DIRECT_CONVERSATION
 )
 from app.db.redis import redis_manager
 from app.core.observability import get_logger, MetricsCollector, trace_operation
+from app.core.config import settings
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -22,6 +35,93 @@ if TYPE_CHECKING:
 
 logger = get_logger(__name__)
 
+# Cached enum values -> members; a dict lookup is cheaper than calling the enum
+_MESSAGE_TYPES = {member.value: member for member in MessageType}
+_CONVERSATION_TYPES = {member.value: member for member in ConversationType}
+_CONVERSATION_STATUSES = {member.value: member for member in ConversationStatus}
+
+# get_conversation cache entry for an id with no conversation
+_MISSING = {"__none__": True}
+_MISSING_TTL = 30
+
+# Insert/lookup rounds before giving up on a direct conversation whose
+# conflicting row keeps being closed in between
+_DIRECT_INSERT_ATTEMPTS = 3
+
+# One lock per conversation being loaded after a cache miss, so concurrent
+# misses in this process wait for the first load instead of repeating it
+_miss_locks: Dict[str, asyncio.Lock] = {}
+
+# Fields update_conversation accepts: API field name -> model attribute
+_UPDATE_FIELDS = MappingProxyType({"title": "title", "status": "status", "metadata": "meta_data"})
+
+
+def encode_cursor(conversation: Conversation) -> str:
+    """
+    Build the list_conversations cursor that resumes after a conversation.
+    
+    Args:
+        conversation: Last conversation of the current page
+        
+    Returns:
+        Opaque URL-safe cursor string
+    """
+    last_message_at = conversation.last_message_at.isoformat() if conversation.last_message_at else ""
+    raw = f"{last_message_at}|{conversation.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[Optional[datetime], uuid.UUID]:
+    """
+    Decode a cursor from encode_cursor.
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        last_message_at, _, conversation_id = base64.urlsafe_b64decode(
+            cursor.encode()
+        ).decode().partition("|")
+        return (
+            datetime.fromisoformat(last_message_at) if last_message_at else None,
+            uuid.UUID(conversation_id)
+        )
+    except Exception:
+        raise ValueError("Invalid cursor") from None
+
+
+def _conversation_from_cache(cached_data: Dict[str, Any]) -> Conversation:
+    """
+    Rebuild a detached Conversation from get_conversation's cache entry.
+    
+    The instance is created the way the ORM loader creates rows, through
+    the class manager, and its attributes are written straight into
+    ``__dict__``. This skips the per-attribute set events the constructor
+    fires; the object is transient and never flushed.
+    """
+    conversation = class_mapper(Conversation).class_manager.new_instance()
+    conversation.__dict__.update(
+        id=uuid.UUID(cached_data["id"]),
+        participant_from=cached_data.get("participant_from"),
+        participant_to=cached_data.get("participant_to"),
+        channel_type=_MESSAGE_TYPES[cached_data["channel_type"]],
+        # Default to DIRECT if not in cache (backwards compat)
+        type=_CONVERSATION_TYPES[cached_data.get("type", "direct")],
+        status=_CONVERSATION_STATUSES[cached_data["status"]],
+        message_count=cached_data["message_count"],
+        unread_count=cached_data["unread_count"],
+        title=cached_data.get("title"),
+        last_message_at=datetime.fromisoformat(cached_data["last_message_at"]) if cached_data.get("last_message_at") else None,
+        created_at=datetime.fromisoformat(cached_data["created_at"]) if cached_data.get("created_at") else None,
+        updated_at=datetime.fromisoformat(cached_data["updated_at"]) if cached_data.get("updated_at") else None,
+        meta_data=cached_data.get("meta_data", {})
+    )
+    return conversation
+
+
+class ConversationConflictError(Exception):
+    """An update would give a participant pair a second open direct conversation."""
+
 
 class ConversationService:
     """Service for handling conversation operations."""
@@ -44,17 +144,19 @@ class ConversationService:
             Created Conversation
         """
         try:
-            # For DIRECT, check if exists
             if request.type == ConversationType.DIRECT:
-                existing = await self._find_direct_conversation(
-                    request.participant_from,
-                    request.participant_to,
-                    request.channel_type
+                participant_from, participant_to = request.participant_from, request.participant_to
+                if not participant_from or not participant_to:
+                    raise ValueError(
+                        "direct conversations require 'participant_from' and 'participant_to'"
+                    )
+                return await self._insert_direct_conversation(
+                    participant_from,
+                    participant_to,
+                    request.channel_type,
+                    title=request.title,
+                    metadata=request.metadata
                 )
-                if existing:
-                    return existing
-
-
             
             conversation = Conversation(
                 type=request.type,
@@ -82,6 +184,69 @@ class ConversationService:
             await self.db.rollback()
             raise
 
+    async def _insert_direct_conversation(
+        self,
+        participant_from: str,
+        participant_to: str,
+        channel_type: MessageType,
+        title: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Conversation:
+        """
+        Create a direct conversation, or return the one that already exists.
+        
+        A single INSERT ... ON CONFLICT DO NOTHING RETURNING on the
+        uq_conversation_direct partial index creates the row. Only when the
+        pair already has an open direct conversation does a second query
+        look it up. Concurrent creates for the same pair get the same
+        conversation instead of an IntegrityError; a pair whose earlier
+        conversation is closed gets a new one.
+        
+        Raises:
+            RuntimeError: If the conflicting conversation keeps being closed
+                between the insert and the lookup
+        """
+        # Normalize participants order, as _find_direct_conversation does
+        p1, p2 = sorted([participant_from, participant_to])
+        insert = sqlite_insert if self.db.bind.dialect.name == "sqlite" else pg_insert
+        
+        for _ in range(_DIRECT_INSERT_ATTEMPTS):
+            result = await self.db.execute(
+                insert(Conversation)
+                .values(
+                    type=ConversationType.DIRECT,
+                    participant_from=p1,
+                    participant_to=p2,
+                    channel_type=channel_type,
+                    title=title,
+                    status=ConversationStatus.ACTIVE,
+                    meta_data=metadata or {}
+                )
+                .on_conflict_do_nothing(
+                    index_elements=["participant_from", "participant_to", "channel_type"],
+                    index_where=OPEN_DIRECT_CONVERSATION
+                )
+                .returning(Conversation)
+            )
+            conversation = result.scalar_one_or_none()
+            
+            if conversation is not None:
+                logger.info(
+                    "Conversation created",
+                    conversation_id=str(conversation.id),
+                    type=ConversationType.DIRECT.value
+                )
+                return conversation
+            
+            conversation = await self._find_direct_conversation(p1, p2, channel_type)
+            if conversation is not None:
+                return conversation
+            # The conflicting conversation was closed after the insert; retry
+        
+        raise RuntimeError(
+            f"Could not create or find a direct conversation for {p1} and {p2}"
+        )
+    
     async def _find_direct_conversation(
         self, 
         participant_from: str, 
@@ -92,16 +257,15 @@ class ConversationService:
         # Normalize participants order for consistent lookup
         p1, p2 = sorted([participant_from, participant_to])
         
-        query = select(Conversation).where(
-            and_(
+        result = await self.db.execute(lambda_stmt(
+            lambda: select(Conversation).where(
                 Conversation.type == ConversationType.DIRECT,
                 Conversation.participant_from == p1,
                 Conversation.participant_to == p2,
                 Conversation.channel_type == channel_type,
                 Conversation.status != ConversationStatus.CLOSED
             )
-        )
-        result = await self.db.execute(query)
+        ))
         return result.scalar_one_or_none()
     
 
@@ -127,81 +291,107 @@ class ConversationService:
             cache_key = f"conversation:{conversation_id}"
             cached_data = await redis_manager.get(cache_key)
             
+            if not cached_data and not include_messages:
+                lock = _miss_locks.get(cache_key)
+                if lock is not None and lock.locked():
+                    # Another request in this process is loading the same
+                    # conversation; wait for it and read what it cached
+                    async with lock:
+                        pass
+                    cached_data = await redis_manager.get(cache_key)
+            
             if cached_data:
                 logger.debug(f"Conversation cache hit: {conversation_id}")
                 MetricsCollector.track_cache_operation("get", True)
                 
+                if cached_data.get("__none__"):
+                    return None
+                
                 # If messages are not needed, reconstruct from cache without DB query
                 if not include_messages:
-                    # Create a detached Conversation object from cached data
-                    from datetime import datetime
-                    
-                    conversation = Conversation(
-                        id=uuid.UUID(cached_data["id"]),
-                        participant_from=cached_data.get("participant_from"),
-                        participant_to=cached_data.get("participant_to"),
-                        channel_type=MessageType(cached_data["channel_type"]),
-                        # Default to DIRECT if not in cache (backwards compat)
-                        type=ConversationType(cached_data.get("type", "direct")),
-                        status=ConversationStatus(cached_data["status"]),
-                        message_count=cached_data["message_count"],
-                        unread_count=cached_data["unread_count"],
-                        title=cached_data.get("title"),
-                        last_message_at=datetime.fromisoformat(cached_data["last_message_at"]) if cached_data.get("last_message_at") else None,
-                        created_at=datetime.fromisoformat(cached_data["created_at"]) if cached_data.get("created_at") else None,
-                        updated_at=datetime.fromisoformat(cached_data["updated_at"]) if cached_data.get("updated_at") else None,
-                        meta_data=cached_data.get("meta_data", {})
-                    )
+                    conversation = _conversation_from_cache(cached_data)
                     logger.debug(f"Returned conversation from cache without DB query: {conversation_id}")
                     return conversation
                 else:
                     # Messages needed - query DB with relationships
                     logger.debug(f"Cache hit but loading messages from DB: {conversation_id}")
-                    query = select(Conversation).where(Conversation.id == conversation_id)
-                    query = query.options(selectinload(Conversation.messages))
-                    result = await self.db.execute(query)
-                    return result.scalar_one_or_none()
+                    result = await self.db.execute(lambda_stmt(
+                        lambda: select(Conversation)
+                        .where(Conversation.id == conversation_id)
+                        .options(joinedload(Conversation.messages))
+                    ))
+                    return result.unique().scalar_one_or_none()
             
             # Cache miss - fetch from database
             logger.debug(f"Conversation cache miss: {conversation_id}")
             MetricsCollector.track_cache_operation("get", False)
             
-            query = select(Conversation).where(Conversation.id == conversation_id)
-            
-            if include_messages:
-                query = query.options(selectinload(Conversation.messages))
-            
-            result = await self.db.execute(query)
-            conversation = result.scalar_one_or_none()
-            
-            if conversation:
-                # Cache conversation metadata
-                cache_data = {
-                    "id": str(conversation.id),
-                    "participant_from": conversation.participant_from,
-                    "participant_to": conversation.participant_to,
-                    "channel_type": conversation.channel_type.value,
-                    "type": conversation.type.value,
-                    "status": conversation.status.value,
-                    "message_count": conversation.message_count,
-                    "unread_count": conversation.unread_count,
-                    "title": conversation.title,
-                    "last_message_at": conversation.last_message_at.isoformat() if conversation.last_message_at else None,
-                    "created_at": conversation.created_at.isoformat() if conversation.created_at else None,
-                    "updated_at": conversation.updated_at.isoformat() if conversation.updated_at else None,
-                    "meta_data": conversation.meta_data or {}
-                }
-                
-                await redis_manager.set(cache_key, cache_data, ttl=300)  # 5 minutes
-                MetricsCollector.track_cache_operation("set", True)
-                logger.debug(f"Cached conversation: {conversation_id}")
-            
-            return conversation
+            lock = _miss_locks.setdefault(cache_key, asyncio.Lock())
+            try:
+                async with lock:
+                    return await self._load_conversation(
+                        conversation_id, cache_key, include_messages
+                    )
+            finally:
+                if _miss_locks.get(cache_key) is lock and not lock.locked():
+                    del _miss_locks[cache_key]
             
         except Exception as e:
             logger.error(f"Failed to get conversation: {e}", exc_info=True)
             return None
     
+    async def _load_conversation(
+        self,
+        conversation_id: str,
+        cache_key: str,
+        include_messages: bool
+    ) -> Optional[Conversation]:
+        """
+        Load a conversation from the database and cache the result.
+        
+        A missing conversation is cached too, briefly, so repeated lookups
+        of an unknown id don't each reach the database. Ids are generated
+        on insert, so no conversation can appear under a cached miss.
+        """
+        # Built and compiled once, then reused with fresh parameters
+        query = lambda_stmt(lambda: select(Conversation).where(Conversation.id == conversation_id))
+        
+        if include_messages:
+            # One parent row: a LEFT OUTER JOIN loads the messages in the
+            # same round trip instead of a second SELECT ... IN
+            query += lambda s: s.options(joinedload(Conversation.messages))
+        
+        result = await self.db.execute(query)
+        conversation = result.unique().scalar_one_or_none()
+        
+        if conversation is None:
+            await redis_manager.set(cache_key, _MISSING, ttl=_MISSING_TTL)
+            return None
+        
+        # Cache conversation metadata; orjson encodes the UUID,
+        # enum and datetime values natively in the same format
+        cache_data = {
+            "id": conversation.id,
+            "participant_from": conversation.participant_from,
+            "participant_to": conversation.participant_to,
+            "channel_type": conversation.channel_type,
+            "type": conversation.type,
+            "status": conversation.status,
+            "message_count": conversation.message_count,
+            "unread_count": conversation.unread_count,
+            "title": conversation.title,
+            "last_message_at": conversation.last_message_at,
+            "created_at": conversation.created_at,
+            "updated_at": conversation.updated_at,
+            "meta_data": conversation.meta_data or {}
+        }
+        
+        await redis_manager.set(cache_key, cache_data, ttl=settings.conversation_cache_ttl)
+        MetricsCollector.track_cache_operation("set", True)
+        logger.debug(f"Cached conversation: {conversation_id}")
+        
+        return conversation
+    
     @trace_operation("list_conversations")
     async def list_conversations(
         self,
@@ -210,11 +400,18 @@ class ConversationService:
         status: Optional[ConversationStatus] = None,
         type: Optional[ConversationType] = None,
         limit: int = 50,
-        offset: int = 0
+        offset: int = 0,
+        cursor: Optional[str] = None
     ) -> tuple[List[Conversation], int]:
         """
         List conversations with filters.
         
+        Pages are ordered by last message time (conversations without
+        messages first, as PostgreSQL sorts NULLs in DESC), then id. With a
+        cursor the page starts right after the conversation it was built
+        from and offset is ignored, so deep pages cost the same as the
+        first one.
+        
         Args:
             participant: Filter by participant (from or to)
             channel_type: Filter by channel type
@@ -222,10 +419,16 @@ class ConversationService:
             type: Filter by conversation type
             limit: Max results
             offset: Skip results
+            cursor: Cursor from encode_cursor() for the previous page
             
         Returns:
             Tuple of (list of conversations, total count)
+            
+        Raises:
+            ValueError: If the cursor is malformed
         """
+        after = _decode_cursor(cursor) if cursor else None
+        
         try:
             query = select(Conversation)
             
@@ -246,30 +449,57 @@ class ConversationService:
             if type:
                 query = query.where(Conversation.type == type)
             
-            # Get total count before pagination
-            count_query = select(func.count()).select_from(Conversation)
-            if participant:
-                count_query = count_query.where(
-                    or_(
-                        Conversation.participant_from == participant,
-                        Conversation.participant_to == participant
-                    )
-                )
-            if channel_type:
-                count_query = count_query.where(Conversation.channel_type == channel_type)
-            if status:
-                count_query = count_query.where(Conversation.status == status)
-            if type:
-                count_query = count_query.where(Conversation.type == type)
-            
-            count_result = await self.db.execute(count_query)
-            total = count_result.scalar() or 0
+            filtered = query
             
             # Order by last message and paginate
-            query = query.order_by(desc(Conversation.last_message_at))
-            query = query.limit(limit).offset(offset)
+            if after:
+                after_at, after_id = after
+                if after_at is None:
+                    # Still in the leading block without messages
+                    query = query.where(or_(
+                        and_(
+                            Conversation.last_message_at.is_(None),
+                            Conversation.id < after_id
+                        ),
+                        Conversation.last_message_at.is_not(None)
+                    ))
+                else:
+                    # Rows without messages compare as NULL and drop out
+                    query = query.where(
+                        tuple_(Conversation.last_message_at, Conversation.id)
+                        < tuple_(
+                            literal(after_at, Conversation.last_message_at.type),
+                            literal(after_id, Conversation.id.type)
+                        )
+                    )
             
-            result = await self.db.execute(query)
+            # Same order as a backward scan of idx_conversation_last_message
+            query = query.order_by(
+                desc(Conversation.last_message_at).nulls_first(),
+                desc(Conversation.id)
+            )
+            query = query.limit(limit)
+            if not after:
+                query = query.offset(offset)
+            
+            if self._count_on_own_connection:
+                # Count and page run concurrently on two pooled connections;
+                # wait for both before raising, so a failed count never
+                # leaves the page query running on the request session
+                total, result = await asyncio.gather(
+                    self._get_cached_count(filtered, participant, channel_type, status, type),
+                    self.db.execute(query),
+                    return_exceptions=True
+                )
+                if isinstance(total, BaseException):
+                    raise total
+                if isinstance(result, BaseException):
+                    raise result
+            else:
+                result = await self.db.execute(query)
+                total = await self._get_cached_count(
+                    filtered, participant, channel_type, status, type
+                )
             conversations = result.scalars().all()
             
             return conversations, total
@@ -278,6 +508,60 @@ class ConversationService:
             logger.error(f"Failed to list conversations: {e}")
             return [], 0
     
+    @property
+    def _count_on_own_connection(self) -> bool:
+        """
+        Whether the listing count can use a second pooled connection.
+        
+        SQLite shares one connection per database, so there the count runs
+        on the request session after the page query.
+        """
+        return self.db.bind.dialect.name != "sqlite"
+    
+    async def _get_cached_count(
+        self,
+        query: Select,
+        participant: Optional[str],
+        channel_type: Optional[MessageType],
+        status: Optional[ConversationStatus],
+        type: Optional[ConversationType]
+    ) -> int:
+        """
+        Count the rows a filtered conversation query matches, cached briefly.
+        
+        Every page of a listing shares one count, so paging no longer repeats
+        the aggregate. Totals can lag new conversations by the 30s TTL.
+        
+        Args:
+            query: Filtered select(Conversation), before ordering and paging
+            participant, channel_type, status, type: The filters, for the key
+            
+        Returns:
+            Number of matching conversations
+        """
+        # Hash the filter tuple; unset filters encode as null, so no
+        # participant value can collide with another filter combination
+        filters = orjson.dumps([
+            getattr(value, "value", value)
+            for value in (participant, channel_type, status, type)
+        ])
+        cache_key = f"conversation_count:{hashlib.blake2b(filters, digest_size=16).hexdigest()}"
+        
+        total = await redis_manager.get(cache_key)
+        if total is not None:
+            MetricsCollector.track_cache_operation("get", True)
+            return total
+        MetricsCollector.track_cache_operation("get", False)
+        
+        count_query = query.with_only_columns(func.count(), maintain_column_froms=True)
+        if self._count_on_own_connection:
+            async with AsyncSession(self.db.bind) as session:
+                total = (await session.execute(count_query)).scalar() or 0
+        else:
+            total = (await self.db.execute(count_query)).scalar() or 0
+        await redis_manager.set(cache_key, total, ttl=30)
+        return total
+    
     @trace_operation("update_conversation")
     async def update_conversation(
         self,
@@ -293,23 +577,27 @@ class ConversationService:
             
         Returns:
             True if updated
+            
+        Raises:
+            ConversationConflictError: If reopening a direct conversation
+                whose participants already have an open one
         """
         try:
-            conversation = await self.db.get(Conversation, conversation_id)
-            if not conversation:
+            values = {
+                _UPDATE_FIELDS[field]: value
+                for field, value in updates.items()
+                if field in _UPDATE_FIELDS
+            }
+            
+            found = await self._execute_returning_id(
+                update(Conversation)
+                .where(Conversation.id == conversation_id)
+                .values(**values, updated_at=func.now())
+            )
+            if not found:
                 logger.warning(f"Conversation not found: {conversation_id}")
                 return False
             
-            # Update allowed fields
-            allowed_fields = ["title", "status", "metadata"]
-            for field, value in updates.items():
-                if field in allowed_fields:
-                    setattr(conversation, field, value)
-            
-            conversation.updated_at = datetime.utcnow()
-            
-            await self.db.commit()
-            
             # Invalidate cache
             await redis_manager.delete(f"conversation:{conversation_id}")
             
@@ -321,12 +609,41 @@ class ConversationService:
             
             return True
             
+        except IntegrityError:
+            # Only uq_conversation_direct can reject these columns: reopening
+            # a closed direct conversation whose pair already has an open one
+            await self.db.rollback()
+            raise ConversationConflictError(
+                "The participants already have an open direct conversation"
+            ) from None
         except Exception as e:
             await self.db.rollback()
             logger.error(f"Failed to update conversation: {e}")
             return False
 
     
+    async def _execute_returning_id(self, stmt: Update | Delete) -> bool:
+        """
+        Run a single-conversation UPDATE or DELETE and commit it.
+        
+        RETURNING reports whether the row existed, so no SELECT precedes
+        the write and nothing enters the identity map.
+        
+        Args:
+            stmt: update()/delete() of Conversation filtered by id
+            
+        Returns:
+            True if a row was changed; False, with nothing committed, if
+            none matched
+        """
+        result = await self.db.execute(stmt.returning(Conversation.id))
+        if result.scalar_one_or_none() is None:
+            # Nothing was written; the session's transaction is get_db's
+            return False
+        
+        await self.db.commit()
+        return True
+    
     @trace_operation("delete_conversation")
     async def delete_conversation(
         self,
@@ -344,20 +661,21 @@ class ConversationService:
             True if deleted
         """
         try:
-            conversation = await self.db.get(Conversation, conversation_id)
-            if not conversation:
-                return False
-            
+            stmt: Update | Delete
             if soft_delete:
                 # Soft delete - mark as closed
-                conversation.status = ConversationStatus.CLOSED
-                conversation.updated_at = datetime.utcnow()
+                stmt = (
+                    update(Conversation)
+                    .where(Conversation.id == conversation_id)
+                    .values(status=ConversationStatus.CLOSED, updated_at=func.now())
+                )
             else:
-                # Hard delete - remove from database
-                # Messages will be cascade deleted
-                await self.db.delete(conversation)
+                # Hard delete - messages, events and attachments are removed
+                # by the ON DELETE CASCADE foreign keys, not loaded by the ORM
+                stmt = delete(Conversation).where(Conversation.id == conversation_id)
             
-            await self.db.commit()
+            if not await self._execute_returning_id(stmt):
+                return False
             
             # Clean up cache
             await redis_manager.delete(f"conversation:{conversation_id}")
@@ -391,36 +709,40 @@ class ConversationService:
             Tuple of (list of matching conversations, total count)
         """
         try:
-            # Search by participants
-            conversations_query = select(Conversation).where(
+            pattern = f"%{query}%"
+            
+            # Candidate ids from both sources in one statement; participant
+            # and title matches rank ahead of message-content matches
+            by_participant = select(
+                Conversation.id.label("id"), literal(0).label("rank")
+            ).where(
                 or_(
-                    Conversation.participant_from.ilike(f"%{query}%"),
-                    Conversation.participant_to.ilike(f"%{query}%"),
-                    Conversation.title.ilike(f"%{query}%") if Conversation.title else False
+                    Conversation.participant_from.ilike(pattern),
+                    Conversation.participant_to.ilike(pattern),
+                    Conversation.title.ilike(pattern)
                 )
-            ).limit(limit)
-            
-            result = await self.db.execute(conversations_query)
-            conversations = result.scalars().all()
-            
-            # Also search in message content (limited for performance)
-            if len(conversations) < limit:
-                messages_query = select(Message.conversation_id).distinct().where(
-                    Message.body.ilike(f"%{query}%")
-                ).limit(limit - len(conversations))
-                
-                message_result = await self.db.execute(messages_query)
-                conversation_ids = message_result.scalars().all()
-                
-                if conversation_ids:
-                    additional_query = select(Conversation).where(
-                        Conversation.id.in_(conversation_ids)
-                    )
-                    additional_result = await self.db.execute(additional_query)
-                    conversations.extend(additional_result.scalars().all())
+            )
+            by_message = select(
+                Message.conversation_id.label("id"), literal(1).label("rank")
+            ).where(Message.body.ilike(pattern))
+            
+            matches = union_all(by_participant, by_message).subquery()
+            best = select(
+                matches.c.id, func.min(matches.c.rank).label("rank")
+            ).group_by(matches.c.id).subquery()
+            
+            # The ranking already sorts every match, so the window count
+            # reports the full total at no extra scan
+            search_query = (
+                select(Conversation, func.count().over().label("total"))
+                .join(best, Conversation.id == best.c.id)
+                .order_by(best.c.rank, desc(Conversation.last_message_at).nulls_last())
+                .limit(limit)
+            )
             
-            final_conversations = conversations[:limit]
-            return final_conversations, len(final_conversations)
+            rows = (await self.db.execute(search_query)).all()
+            conversations = [row.Conversation for row in rows]
+            return conversations, rows[0].total if rows else 0
             
         except Exception as e:
             logger.error(f"Failed to search conversations: {e}")
@@ -5,16 +5,19 @@ Core message service handling business logic for sending and receiving messages.
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 import uuid
-from sqlalchemy import select, and_, or_, func
+from sqlalchemy import select, func, lambda_stmt
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.models.database import (
     Message, Conversation, MessageEvent, WebhookLog,
     MessageType, MessageDirection, MessageStatus, EventType,
-    ConversationStatus, Provider
+    ConversationType, Provider
 )
 from app.providers.base import ProviderFactory, ProviderSelector
+from app.services.conversation_service import ConversationService
 from app.db.redis import redis_manager
 from app.core.observability import get_logger, MetricsCollector, trace_operation, monitor_performance
 from app.core.config import settings
@@ -23,6 +26,12 @@ from app.core.config import settings
 
 logger = get_logger(__name__)
 
+# Cached enum values -> members; a dict lookup is cheaper than calling the enum
+_PROVIDERS = {member.value: member for member in Provider}
+_DIRECTIONS = {member.value: member for member in MessageDirection}
+_STATUSES = {member.value: member for member in MessageStatus}
+_MESSAGE_TYPES = {member.value: member for member in MessageType}
+
 
 class MessageService:
     """Service for handling message operations."""
@@ -355,22 +364,8 @@ class MessageService:
             Created message object
         """
         try:
-            # Check for duplicate
-            existing = await self.db.execute(
-                select(Message).where(
-                    and_(
-                        Message.provider == Provider(provider),
-                        Message.provider_message_id == webhook_data.get("provider_message_id")
-                    )
-                )
-            )
-            if existing.scalar_one_or_none():
-                logger.warning(
-                    "Duplicate message received",
-                    provider=provider,
-                    provider_message_id=webhook_data.get("provider_message_id")
-                )
-                return existing.scalar_one()
+            provider_enum = Provider(provider)
+            provider_message_id = webhook_data.get("provider_message_id")
             
             # Determine message type
             message_type = MessageType(webhook_data["type"])
@@ -382,24 +377,46 @@ class MessageService:
                 channel_type=message_type
             )
             
-            # Create message
-            message = Message(
-                conversation_id=conversation.id,
-                provider=Provider(provider),
-                provider_message_id=webhook_data.get("provider_message_id"),
-                direction=MessageDirection.INBOUND,
-                status=MessageStatus.DELIVERED,
-                message_type=message_type,
-                from_address=webhook_data["from"],
-                to_address=webhook_data["to"],
-                body=webhook_data.get("body"),
-                attachments=webhook_data.get("attachments", []),
-                delivered_at=datetime.utcnow(),
-                meta_data=webhook_data.get("metadata", {})
+            # Create message; a redelivered webhook hits uq_provider_message
+            # and inserts nothing, so no duplicate check precedes the insert
+            insert = sqlite_insert if self.db.bind.dialect.name == "sqlite" else pg_insert
+            result = await self.db.execute(
+                insert(Message)
+                .values(
+                    conversation_id=conversation.id,
+                    provider=provider_enum,
+                    provider_message_id=provider_message_id,
+                    direction=MessageDirection.INBOUND,
+                    status=MessageStatus.DELIVERED,
+                    message_type=message_type,
+                    from_address=webhook_data["from"],
+                    to_address=webhook_data["to"],
+                    body=webhook_data.get("body"),
+                    attachments=webhook_data.get("attachments", []),
+                    delivered_at=datetime.utcnow(),
+                    meta_data=webhook_data.get("metadata", {})
+                )
+                .on_conflict_do_nothing(
+                    index_elements=["provider", "provider_message_id"],
+                    index_where=Message.provider_message_id.is_not(None)
+                )
+                .returning(Message)
             )
+            message = result.scalar_one_or_none()
             
-            self.db.add(message)
-            await self.db.flush()
+            if message is None:
+                logger.warning(
+                    "Duplicate message received",
+                    provider=provider,
+                    provider_message_id=provider_message_id
+                )
+                existing = await self.db.execute(lambda_stmt(
+                    lambda: select(Message).where(
+                        Message.provider == provider_enum,
+                        Message.provider_message_id == provider_message_id
+                    )
+                ))
+                return existing.scalar_one()
             
             # Create event
             await self._create_message_event(
@@ -415,12 +432,10 @@ class MessageService:
             
             await self.db.commit()
             
-            # Invalidate conversation cache after update
-            await redis_manager.delete(f"conversation:{conversation.id}")
-            logger.debug(f"Invalidated conversation cache: {conversation.id}")
-            
-            # Publish to real-time channel
-            await redis_manager.publish(
+            # Invalidate conversation cache and publish to the real-time
+            # channel in one round trip
+            await redis_manager.delete_and_publish(
+                f"conversation:{conversation.id}",
                 f"conversation:{conversation.id}",
                 {
                     "type": "new_message",
@@ -428,6 +443,7 @@ class MessageService:
                     "conversation_id": str(conversation.id)
                 }
             )
+            logger.debug(f"Invalidated conversation cache: {conversation.id}")
             
             # Track metrics
             MetricsCollector.track_message(
@@ -484,11 +500,11 @@ class MessageService:
                     message = Message(
                         id=uuid.UUID(cached_data["id"]),
                         conversation_id=uuid.UUID(cached_data["conversation_id"]),
-                        provider=Provider(cached_data["provider"]) if cached_data.get("provider") else None,
+                        provider=_PROVIDERS[cached_data["provider"]] if cached_data.get("provider") else None,
                         provider_message_id=cached_data.get("provider_message_id"),
-                        direction=MessageDirection(cached_data["direction"]),
-                        status=MessageStatus(cached_data["status"]),
-                        message_type=MessageType(cached_data["message_type"]),
+                        direction=_DIRECTIONS[cached_data["direction"]],
+                        status=_STATUSES[cached_data["status"]],
+                        message_type=_MESSAGE_TYPES[cached_data["message_type"]],
                         from_address=cached_data["from_address"],
                         to_address=cached_data["to_address"],
                         body=cached_data.get("body"),
@@ -516,33 +532,38 @@ class MessageService:
             logger.debug(f"Message cache miss: {message_id}")
             MetricsCollector.track_cache_operation("get", False)
             
-            query = select(Message).where(Message.id == message_id)
+            # Lambda statements are built and compiled once, then reused
+            # with fresh parameters
+            query = lambda_stmt(lambda: select(Message).where(Message.id == message_id))
             
             if include_relationships:
-                query = query.options(selectinload(Message.conversation))
-                query = query.options(selectinload(Message.events))
+                query += lambda s: s.options(
+                    selectinload(Message.conversation),
+                    selectinload(Message.events)
+                )
             
             result = await self.db.execute(query)
             message = result.scalar_one_or_none()
             
             if message:
-                # Cache the message data
+                # Cache the message data; orjson encodes the UUID, enum
+                # and datetime values natively in the same format
                 cache_data = {
-                    "id": str(message.id),
-                    "conversation_id": str(message.conversation_id),
-                    "provider": message.provider.value if message.provider else None,
+                    "id": message.id,
+                    "conversation_id": message.conversation_id,
+                    "provider": message.provider,
                     "provider_message_id": message.provider_message_id,
-                    "direction": message.direction.value,
-                    "status": message.status.value,
-                    "message_type": message.message_type.value,
+                    "direction": message.direction,
+                    "status": message.status,
+                    "message_type": message.message_type,
                     "from_address": message.from_address,
                     "to_address": message.to_address,
                     "body": message.body,
                     "attachments": message.attachments or [],
-                    "sent_at": message.sent_at.isoformat() if message.sent_at else None,
-                    "delivered_at": message.delivered_at.isoformat() if message.delivered_at else None,
-                    "created_at": message.created_at.isoformat() if message.created_at else None,
-                    "updated_at": message.updated_at.isoformat() if message.updated_at else None,
+                    "sent_at": message.sent_at,
+                    "delivered_at": message.delivered_at,
+                    "created_at": message.created_at,
+                    "updated_at": message.updated_at,
                     "meta_data": message.meta_data or {}
                 }
                 
@@ -580,7 +601,8 @@ class MessageService:
             Tuple of (list of messages, total count)
         """
         try:
-            query = select(Message).options(selectinload(Message.conversation))
+            # Callers only read conversation_id, so the parent isn't loaded
+            query = select(Message)
             
             if conversation_id:
                 query = query.where(Message.conversation_id == conversation_id)
@@ -700,49 +722,16 @@ class MessageService:
         to_address: str,
         channel_type: MessageType
     ) -> Conversation:
-        """Get or create conversation."""
-        # Try to find existing conversation
-        result = await self.db.execute(
-            select(Conversation).where(
-                or_(
-                    and_(
-                        Conversation.participant_from == from_address,
-                        Conversation.participant_to == to_address
-                    ),
-                    and_(
-                        Conversation.participant_from == to_address,
-                        Conversation.participant_to == from_address
-                    )
-                ),
-                Conversation.channel_type == channel_type,
-                Conversation.type == ConversationType.DIRECT
-            ).order_by(Conversation.created_at.desc())
-        )
-        
-        # Use first() instead of scalar_one_or_none() to handle multiple conversations
-        conversation = result.scalars().first()
-        
-        if not conversation:
-            # Create new conversation
-            conversation = Conversation(
-                participant_from=from_address,
-                participant_to=to_address,
-                channel_type=channel_type,
-                type=ConversationType.DIRECT,
-                status=ConversationStatus.ACTIVE,
-                meta_data={}
-            )
-            self.db.add(conversation)
-            await self.db.flush()
-            
-            logger.info(
-                "Created new conversation",
-                conversation_id=str(conversation.id),
-                from_address=from_address,
-                to_address=to_address
-            )
+        """
+        Get or create the open direct conversation for a pair.
         
-        return conversation
+        Uses the same sorted-participant ON CONFLICT insert as
+        ConversationService.create_conversation, so sends, receives and the
+        API all share one conversation per pair and channel.
+        """
+        return await ConversationService(self.db)._insert_direct_conversation(
+            from_address, to_address, channel_type
+        )
     
     async def _create_message_event(
         self,
@@ -750,12 +739,18 @@ class MessageService:
         event_type: EventType,
         event_data: Dict[str, Any]
     ):
-        """Create message event."""
+        """
+        Create message event.
+        
+        The event is added to the caller's session and written by the same
+        commit as the status change it records, so events never outlive a
+        rolled-back update and need no commit of their own. meta_data is
+        left to its server default.
+        """
         event = MessageEvent(
             message_id=message_id,
             event_type=event_type,
-            event_data=event_data,
-            meta_data={}
+            event_data=event_data
         )
         self.db.add(event)
     
@@ -768,10 +763,6 @@ class MessageService:
         }
         
         queue_name = f"message_queue:{message.message_type.value}"
-        await redis_manager.enqueue_message(queue_name, queue_data)
-        
-        # Update queue depth metric
-        MetricsCollector.update_queue_depth(
-            queue_name,
-            await redis_manager.redis_client.xlen(queue_name)
-        )
+        # The queue depth metric is read in the same round trip as the add
+        _, depth = await redis_manager.enqueue_message_with_depth(queue_name, queue_data)
+        MetricsCollector.update_queue_depth(queue_name, depth)
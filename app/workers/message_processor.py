@@ -274,29 +274,23 @@ class MessageProcessor:
                 
                 # Update conversation counts
                 from app.models.database import Conversation, ConversationStatus, MessageType
-                from sqlalchemy import select, func, and_
+                from sqlalchemy import select, func
                 
                 async with db_manager.session_context() as db:
+                    # One grouped query for all channels
+                    query = select(
+                        Conversation.channel_type, func.count()
+                    ).where(
+                        Conversation.status == ConversationStatus.ACTIVE
+                    ).group_by(Conversation.channel_type)
+                    result = await db.execute(query)
+                    counts = dict(result.all())
+                    
+                    # Channels with no active conversations report zero
                     for channel_type in MessageType:
-                        query = select(func.count()).select_from(Conversation).where(
-                            and_(
-                                Conversation.channel_type == channel_type,
-                                Conversation.status == ConversationStatus.ACTIVE
-                            )
+                        MetricsCollector.update_conversation_count(
+                            channel_type.value, counts.get(channel_type, 0)
                         )
-                        result = await db.execute(query)
-                        count = result.scalar()
-                        MetricsCollector.update_conversation_count(channel_type.value, count)
-                
-                # Update database pool metrics
-                from app.core.observability import db_connection_pool
-                if hasattr(db_manager.engine.pool, 'size'):
-                    db_connection_pool.labels(metric_type="active").set(
-                        db_manager.engine.pool.checkedout()
-                    )
-                    db_connection_pool.labels(metric_type="idle").set(
-                        db_manager.engine.pool.size() - db_manager.engine.pool.checkedout()
-                    )
                 
                 await asyncio.sleep(30)  # Update every 30 seconds
                 
@@ -17,6 +17,7 @@ from app.db.session import get_db
 if settings.test_env != "integration":
     settings.database_url = "sqlite+aiosqlite:///:memory:"
     settings.redis_url = "redis://localhost:6379/15"  # Use different DB for non-integration tests
+    settings.mock_simulate_latency = False  # Mock providers answer immediately
 
 
 # Initialize providers for each test to ensure they use the correct event loop
@@ -60,7 +60,7 @@ async def test_rate_limiting(
         delay: Delay between requests in seconds
     """
     print(f"🧪 Testing Rate Limiting")
-    print(f"Target: {base_url}/health")
+    print(f"Target: {base_url}/api/v1/conversations/")
     print(f"Requests: {num_requests}")
     print(f"Delay: {delay}s between requests")
     print("-" * 60)
@@ -69,7 +69,7 @@ async def test_rate_limiting(
         results: List[Dict[str, Any]] = []
         
         for i in range(1, num_requests + 1):
-            result = await send_request(session, f"{base_url}/health", i)
+            result = await send_request(session, f"{base_url}/api/v1/conversations/", i)
             results.append(result)
             
             # Print result
@@ -130,7 +130,7 @@ async def test_burst_requests(
         burst_size: Number of requests in burst
     """
     print(f"\n🚀 Testing Burst Rate Limiting (No Delay)")
-    print(f"Target: {base_url}/health")
+    print(f"Target: {base_url}/api/v1/conversations/")
     print(f"Burst size: {burst_size} requests sent rapidly")
     print("-" * 60)
     
@@ -140,7 +140,7 @@ async def test_burst_requests(
         # Send requests as fast as possible sequentially
         # This ensures they all hit the rate limit window
         for i in range(1, burst_size + 1):
-            result = await send_request(session, f"{base_url}/health", i)
+            result = await send_request(session, f"{base_url}/api/v1/conversations/", i)
             results.append(result)
             
             # Show progress every 20 requests
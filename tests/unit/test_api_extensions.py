@@ -93,3 +93,16 @@ async def test_conversation_api_get(client):
         response = client.get(f"/api/v1/conversations/{conv_id}")
         assert response.status_code == 200
         assert response.json()["id"] == str(conv_id)
+
+@pytest.mark.asyncio
+async def test_conversation_api_update_conflict(client):
+    """Reopening a direct conversation whose pair has an open one answers 409."""
+    from app.services.conversation_service import ConversationConflictError
+    
+    with patch('app.api.v1.conversations.ConversationService') as mock_service_cls:
+        mock_service = AsyncMock()
+        mock_service.update_conversation.side_effect = ConversationConflictError("open")
+        mock_service_cls.return_value = mock_service
+        
+        response = client.patch(f"/api/v1/conversations/{uuid4()}", json={"status": "active"})
+        assert response.status_code == 409
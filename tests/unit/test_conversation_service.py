@@ -3,10 +3,11 @@ import pytest
 from unittest.mock import MagicMock, AsyncMock, patch
 from datetime import datetime
 from uuid import uuid4
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services.conversation_service import ConversationService
-from app.models.database import Conversation, Message, MessageStatus, MessageDirection, MessageType, ConversationStatus
+from app.models.database import Conversation, Message, MessageStatus, MessageDirection, MessageType, ConversationStatus, Provider
 
 @pytest.mark.asyncio
 async def test_get_conversation(async_db):
@@ -26,6 +27,70 @@ async def test_get_conversation(async_db):
     fetched = await service.get_conversation(str(conv.id))
     assert fetched.id == conv.id
 
+@pytest.mark.asyncio
+async def test_get_conversation_with_messages(async_db):
+    """include_messages loads the conversation's messages in time order."""
+    conv = Conversation(participant_from="+J1", participant_to="+J2", channel_type=MessageType.SMS)
+    async_db.add(conv)
+    await async_db.flush()
+    async_db.add_all([
+        Message(
+            conversation_id=conv.id, provider=Provider.TWILIO, direction=MessageDirection.OUTBOUND,
+            message_type=MessageType.SMS, from_address="+J1", to_address="+J2", body=body,
+            created_at=datetime(2024, 1, day)
+        )
+        for day, body in ((2, "second"), (1, "first"))
+    ])
+    await async_db.commit()
+    async_db.expunge_all()
+    
+    service = ConversationService(async_db)
+    with patch("app.services.conversation_service.redis_manager") as mock_redis:
+        mock_redis.get = AsyncMock(return_value=None)
+        mock_redis.set = AsyncMock(return_value=True)
+        fetched = await service.get_conversation(str(conv.id), include_messages=True)
+    
+    assert [m.body for m in fetched.messages] == ["first", "second"]
+
+@pytest.mark.asyncio
+async def test_create_direct_conversation_is_idempotent(async_db):
+    """Creating a direct conversation twice, either way round, yields one row."""
+    from app.api.v1.models import CreateConversationRequest
+    
+    service = ConversationService(async_db)
+    first = await service.create_conversation(CreateConversationRequest(
+        participant_from="+D2", participant_to="+D1", channel_type=MessageType.SMS
+    ))
+    again = await service.create_conversation(CreateConversationRequest(
+        participant_from="+D1", participant_to="+D2", channel_type=MessageType.SMS
+    ))
+    
+    assert again.id == first.id
+    assert (first.participant_from, first.participant_to) == ("+D1", "+D2")
+    assert await async_db.scalar(select(func.count()).select_from(Conversation)) == 1
+
+@pytest.mark.asyncio
+async def test_create_direct_conversation_after_close_starts_new(async_db):
+    """A pair whose direct conversation was closed gets a new active one."""
+    from app.api.v1.models import CreateConversationRequest
+    
+    service = ConversationService(async_db)
+    request = CreateConversationRequest(
+        participant_from="+C1", participant_to="+C2", channel_type=MessageType.SMS
+    )
+    first = await service.create_conversation(request)
+    await async_db.commit()
+    
+    with patch("app.services.conversation_service.redis_manager") as mock_redis:
+        mock_redis.delete = AsyncMock()
+        assert await service.delete_conversation(str(first.id)) is True
+    
+    second = await service.create_conversation(request)
+    
+    assert second.id != first.id
+    assert second.status == ConversationStatus.ACTIVE
+    assert await async_db.scalar(select(func.count()).select_from(Conversation)) == 2
+
 @pytest.mark.asyncio
 @pytest.mark.skip(reason="SQLAlchemy mapping issue")
 async def test_list_conversations(async_db):
@@ -43,7 +108,106 @@ async def test_list_conversations(async_db):
     assert total >= 2
 
 @pytest.mark.asyncio
-@pytest.mark.skip(reason="Likely DB session/ID mismatch")
+async def test_list_conversations_cursor_pages(async_db):
+    """Cursor pages walk every conversation once: unset first, then newest first."""
+    from datetime import timedelta
+    from app.services.conversation_service import encode_cursor
+    
+    base = datetime(2024, 1, 1, 12, 0, 0)
+    convs = [
+        Conversation(
+            participant_from=f"+1{i}", participant_to="+2", channel_type=MessageType.SMS,
+            last_message_at=base + timedelta(minutes=i // 2) if i < 5 else None
+        )
+        for i in range(7)
+    ]
+    async_db.add_all(convs)
+    await async_db.commit()
+    
+    service = ConversationService(async_db)
+    seen, cursor = [], None
+    with patch("app.services.conversation_service.redis_manager") as mock_redis:
+        mock_redis.get = AsyncMock(return_value=None)
+        mock_redis.set = AsyncMock(return_value=True)
+        while True:
+            page, total = await service.list_conversations(limit=2, cursor=cursor)
+            seen.extend(page)
+            if len(page) < 2:
+                break
+            cursor = encode_cursor(page[-1])
+    
+    assert total == 7
+    assert len({c.id for c in seen}) == 7
+    stamps = [c.last_message_at for c in seen]
+    assert stamps[:2] == [None, None]
+    assert stamps[2:] == sorted(stamps[2:], reverse=True)
+    
+    with pytest.raises(ValueError):
+        await service.list_conversations(cursor="not-a-cursor")
+
+@pytest.mark.asyncio
+async def test_list_conversations_uses_cached_total(async_db):
+    """The listing total comes from Redis when cached, else is counted and cached."""
+    async_db.add(Conversation(participant_from="+A", participant_to="+B", channel_type=MessageType.SMS))
+    await async_db.commit()
+    
+    service = ConversationService(async_db)
+    with patch("app.services.conversation_service.redis_manager") as mock_redis:
+        mock_redis.get = AsyncMock(return_value=None)
+        mock_redis.set = AsyncMock(return_value=True)
+        _, total = await service.list_conversations(channel_type=MessageType.SMS)
+        
+        assert total == 1
+        mock_redis.set.assert_awaited_once()
+        key, value = mock_redis.set.call_args.args
+        assert key.startswith("conversation_count:")
+        assert value == 1
+        assert mock_redis.set.call_args.kwargs == {"ttl": 30}
+        
+        mock_redis.get = AsyncMock(return_value=42)
+        _, total = await service.list_conversations(channel_type=MessageType.SMS)
+        
+        assert total == 42
+
+@pytest.mark.asyncio
+async def test_count_cache_key_distinguishes_filters(async_db):
+    """A participant literally named "*" does not share the unfiltered count."""
+    service = ConversationService(async_db)
+    with patch("app.services.conversation_service.redis_manager") as mock_redis:
+        mock_redis.get = AsyncMock(return_value=None)
+        mock_redis.set = AsyncMock(return_value=True)
+        await service.list_conversations()
+        await service.list_conversations(participant="*")
+    
+    unfiltered_key, star_key = (call.args[0] for call in mock_redis.set.call_args_list)
+    assert unfiltered_key != star_key
+
+@pytest.mark.asyncio
+async def test_list_conversations_failed_count_waits_for_page():
+    """A failing concurrent count returns an empty listing only after the page query ends."""
+    import asyncio
+    
+    page_done = asyncio.Event()
+    
+    async def slow_page(query):
+        await asyncio.sleep(0.01)
+        page_done.set()
+        return MagicMock()
+    
+    db = MagicMock()
+    db.bind.dialect.name = "postgresql"
+    db.execute = slow_page
+    
+    service = ConversationService(db)
+    with patch.object(
+        ConversationService, "_get_cached_count",
+        AsyncMock(side_effect=RuntimeError("count failed"))
+    ):
+        assert await service.list_conversations() == ([], 0)
+    
+    assert page_done.is_set()
+
+@pytest.mark.asyncio
 async def test_update_conversation(async_db):
     """Test updating conversation."""
     conv = Conversation(participant_from="+X", participant_to="+Y", channel_type=MessageType.SMS)
@@ -53,11 +217,129 @@ async def test_update_conversation(async_db):
     
     service = ConversationService(async_db)
     
-    success = await service.update_conversation(
-        conv.id, # Pass UUID directly if get expects it, or ensure service handles str
-        {"title": "New Title"}
-    )
+    with patch("app.services.conversation_service.redis_manager") as mock_redis:
+        mock_redis.get = AsyncMock(return_value=None)
+        mock_redis.set = AsyncMock(return_value=True)
+        mock_redis.delete = AsyncMock()
+        success = await service.update_conversation(
+            conv.id, # Pass UUID directly if get expects it, or ensure service handles str
+            {"title": "New Title"}
+        )
+        assert success is True
+        mock_redis.delete.assert_awaited_once_with(f"conversation:{conv.id}")
+        
+        updated = await service.get_conversation(str(conv.id))
+    assert updated.title == "New Title"
+
+@pytest.mark.asyncio
+async def test_update_conversation_metadata_maps_to_column(async_db):
+    """The API 'metadata' field updates the meta_data column, not Base.metadata."""
+    conv = Conversation(participant_from="+M1", participant_to="+M2", channel_type=MessageType.SMS)
+    async_db.add(conv)
+    await async_db.commit()
+    
+    service = ConversationService(async_db)
+    
+    with patch("app.services.conversation_service.redis_manager") as mock_redis:
+        mock_redis.delete = AsyncMock()
+        success = await service.update_conversation(conv.id, {"metadata": {"tag": "vip"}})
+    
     assert success is True
+    await async_db.refresh(conv)
+    assert conv.meta_data == {"tag": "vip"}
+
+@pytest.mark.asyncio
+async def test_reopen_direct_conversation_with_open_pair_conflicts(async_db):
+    """Reopening a closed direct conversation is refused while the pair has an open one."""
+    from app.services.conversation_service import ConversationConflictError
     
-    updated = await service.get_conversation(str(conv.id))
-    assert updated.title == "New Title"
+    closed = Conversation(
+        participant_from="+R1", participant_to="+R2", channel_type=MessageType.SMS,
+        status=ConversationStatus.CLOSED
+    )
+    async_db.add_all([
+        closed,
+        Conversation(participant_from="+R1", participant_to="+R2", channel_type=MessageType.SMS)
+    ])
+    await async_db.commit()
+    closed_id = str(closed.id)
+    
+    service = ConversationService(async_db)
+    with patch("app.services.conversation_service.redis_manager") as mock_redis:
+        mock_redis.delete = AsyncMock()
+        with pytest.raises(ConversationConflictError):
+            await service.update_conversation(closed_id, {"status": ConversationStatus.ACTIVE})
+        
+        # The session is usable again and other updates still apply
+        assert await service.update_conversation(closed_id, {"title": "Old thread"}) is True
+
+@pytest.mark.asyncio
+async def test_update_and_close_missing_conversation(async_db):
+    """Updating or closing an unknown conversation reports not found and keeps the caller's work."""
+    service = ConversationService(async_db)
+    pending = Conversation(participant_from="+P1", participant_to="+P2", channel_type=MessageType.SMS)
+    async_db.add(pending)
+    
+    assert await service.update_conversation(str(uuid4()), {"title": "x"}) is False
+    assert await service.delete_conversation(str(uuid4())) is False
+    
+    await async_db.commit()
+    assert await async_db.scalar(select(func.count()).select_from(Conversation)) == 1
+
+@pytest.mark.asyncio
+async def test_delete_conversation_soft_closes(async_db):
+    """Soft delete marks the conversation closed without removing it."""
+    conv = Conversation(participant_from="+S1", participant_to="+S2", channel_type=MessageType.SMS)
+    async_db.add(conv)
+    await async_db.commit()
+    
+    service = ConversationService(async_db)
+    with patch("app.services.conversation_service.redis_manager") as mock_redis:
+        mock_redis.delete = AsyncMock()
+        assert await service.delete_conversation(str(conv.id)) is True
+    
+    await async_db.refresh(conv)
+    assert conv.status == ConversationStatus.CLOSED
+
+@pytest.mark.asyncio
+async def test_delete_conversation_hard_removes_row(async_db):
+    """Hard delete removes the conversation row with one DELETE."""
+    conv = Conversation(participant_from="+H1", participant_to="+H2", channel_type=MessageType.SMS)
+    async_db.add(conv)
+    await async_db.commit()
+    
+    service = ConversationService(async_db)
+    with patch("app.services.conversation_service.redis_manager") as mock_redis:
+        mock_redis.delete = AsyncMock()
+        assert await service.delete_conversation(str(conv.id), soft_delete=False) is True
+    
+    assert await async_db.scalar(select(Conversation.id).where(Conversation.id == conv.id)) is None
+    assert await service.delete_conversation(str(conv.id), soft_delete=False) is False
+
+@pytest.mark.asyncio
+async def test_search_conversations_ranks_participants_first(async_db):
+    """Participant matches come before message-content matches, each listed once."""
+    by_participant = Conversation(participant_from="+1555", participant_to="+2", channel_type=MessageType.SMS)
+    by_body = Conversation(participant_from="+3", participant_to="+4", channel_type=MessageType.SMS)
+    unrelated = Conversation(participant_from="+5", participant_to="+6", channel_type=MessageType.SMS)
+    async_db.add_all([by_participant, by_body, unrelated])
+    await async_db.flush()
+    async_db.add_all([
+        Message(
+            conversation_id=conv.id, provider=Provider.TWILIO, direction=MessageDirection.OUTBOUND,
+            message_type=MessageType.SMS, from_address="+3", to_address="+4", body=body
+        )
+        for conv, body in [(by_body, "call 555 now"), (by_participant, "555 again"), (unrelated, "hi")]
+    ])
+    await async_db.commit()
+    
+    service = ConversationService(async_db)
+    results, total = await service.search_conversations("555")
+    
+    assert [c.id for c in results] == [by_participant.id, by_body.id]
+    assert total == 2
+    
+    results, total = await service.search_conversations("555", limit=1)
+    
+    assert [c.id for c in results] == [by_participant.id]
+    assert total == 2
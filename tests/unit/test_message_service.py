@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import Mock, AsyncMock, patch, MagicMock
+from unittest.mock import Mock, AsyncMock, patch
 from datetime import datetime
 from uuid import uuid4
 
@@ -15,10 +15,13 @@ async def test_send_message_creates_conversation(async_db, sample_message_data):
     
     # Mock ProviderSelector to return a provider with a valid name
     # Mock ProviderSelector globally via its definition
-    with patch('app.providers.base.ProviderSelector.select_provider', new_callable=AsyncMock) as mock_select:
+    with patch('app.providers.base.ProviderSelector.select_provider', new_callable=AsyncMock) as mock_select, \
+            patch('app.services.message_service.redis_manager') as mock_redis:
         mock_provider = Mock()
         mock_provider.name = "twilio"
         mock_select.return_value = mock_provider
+        mock_redis.enqueue_message_with_depth = AsyncMock(return_value=("msg_123", 0))
+        mock_redis.delete = AsyncMock()
         
         # Send message
         message = await service.send_message(sample_message_data)
@@ -91,6 +94,25 @@ async def test_determine_message_type(async_db):
     assert service._determine_message_type(mms_data) == MessageType.MMS
 
 
+@pytest.mark.asyncio
+async def test_message_path_shares_direct_conversation(async_db):
+    """Sends and receives reuse the API's conversation for a pair in either order."""
+    from app.api.v1.models import CreateConversationRequest
+    from app.services.conversation_service import ConversationService
+    
+    created = await ConversationService(async_db).create_conversation(
+        CreateConversationRequest(
+            participant_from="+M1", participant_to="+M2", channel_type=MessageType.SMS
+        )
+    )
+    
+    service = MessageService(async_db)
+    inbound = await service._get_or_create_conversation("+M2", "+M1", MessageType.SMS)
+    outbound = await service._get_or_create_conversation("+M1", "+M2", MessageType.SMS)
+    
+    assert inbound.id == created.id
+    assert outbound.id == created.id
+
 @pytest.mark.asyncio
 async def test_get_message_returns_none_for_invalid_id(async_db):
     """Test that get_message returns None for invalid ID."""
@@ -115,12 +137,7 @@ async def test_queue_message_for_sending(mock_redis, async_db, sample_message_da
     # Setup mocks
     # mock_redis is the MagicMock replacing redis_manager
     # We set its async methods
-    mock_redis.enqueue_message = AsyncMock(return_value="msg_123")
-    
-    # redis_manager.redis_client property might be accessed
-    # mock_redis.redis_client returns a MagicMock by default
-    # We need to set xlen on THAT MagicMock to be AsyncMock
-    mock_redis.redis_client.xlen = AsyncMock(return_value=5)
+    mock_redis.enqueue_message_with_depth = AsyncMock(return_value=("msg_123", 5))
     
     # Also mock ProviderSelector as send_message uses it
     # Also mock ProviderSelector as send_message uses it
@@ -133,8 +150,8 @@ async def test_queue_message_for_sending(mock_redis, async_db, sample_message_da
         message = await service.send_message(sample_message_data)
         
         # Verify message was queued
-        mock_redis.enqueue_message.assert_called_once()
-        call_args = mock_redis.enqueue_message.call_args
+        mock_redis.enqueue_message_with_depth.assert_called_once()
+        call_args = mock_redis.enqueue_message_with_depth.call_args
         assert "message_queue:sms" in call_args[0]
 
 
@@ -177,10 +194,7 @@ async def test_process_outbound_message_with_retry(async_db):
         else:
             # Need to mock redis for send_message's queueing
             with patch('app.services.message_service.redis_manager') as mock_redis:
-                mock_redis.enqueue_message = AsyncMock(return_value="msg_123")
-                # Ensure xlen is AsyncMock
-                mock_redis.redis_client = MagicMock()
-                mock_redis.redis_client.xlen = AsyncMock(return_value=0)
+                mock_redis.enqueue_message_with_depth = AsyncMock(return_value=("msg_123", 0))
                 
                 # Create message (uses first mock provider)
                 message = await service.send_message(message_data)
@@ -222,7 +236,6 @@ async def test_receive_message_creates_inbound(async_db):
 
 
 @pytest.mark.asyncio
-@pytest.mark.skip(reason="ResourceClosedError in SQLite: pending investigation")
 async def test_receive_duplicate_message(async_db):
     """Test that duplicate messages are not created."""
     service = MessageService(async_db)
@@ -238,14 +251,19 @@ async def test_receive_duplicate_message(async_db):
         "timestamp": datetime.utcnow().isoformat(),
     }
     
-    # Receive first message
-    message1 = await service.receive_message("twilio", webhook_data)
-    
-    # Try to receive duplicate
-    message2 = await service.receive_message("twilio", webhook_data)
+    with patch('app.services.message_service.redis_manager') as mock_redis:
+        mock_redis.delete_and_publish = AsyncMock()
+        
+        # Receive first message
+        message1 = await service.receive_message("twilio", webhook_data)
+        
+        # Try to receive duplicate
+        message2 = await service.receive_message("twilio", webhook_data)
     
     # Should return the same message
     assert message1.id == message2.id
+    # Only the first receive invalidates and publishes
+    mock_redis.delete_and_publish.assert_awaited_once()
 
 
 @pytest.mark.asyncio
@@ -264,9 +282,7 @@ async def test_update_message_status(async_db, sample_message_data):
         # But wait, send_message uses redis unless sync.
         # Let's assume default is async, so we need to mock redis.
         with patch('app.services.message_service.redis_manager') as mock_redis:
-             mock_redis.enqueue_message = AsyncMock(return_value="msg_123")
-             mock_redis.redis_client = MagicMock()
-             mock_redis.redis_client.xlen = AsyncMock(return_value=0)
+             mock_redis.enqueue_message_with_depth = AsyncMock(return_value=("msg_123", 0))
 
              # Ensure mock_redis has all async methods needed
              # If send_message checks cache or anything else
@@ -21,3 +21,26 @@ def test_enums():
     assert MessageStatus.SENT.value == "sent"
     assert MessageDirection.INBOUND.value == "inbound"
     assert Provider.TWILIO.value == "twilio"
+
+def test_uuid7_is_time_ordered():
+    """uuid7 primary keys are version 7 and sort by creation time."""
+    import time
+    from app.models.database import uuid7
+    
+    first = uuid7()
+    time.sleep(0.002)
+    second = uuid7()
+    
+    assert first.version == 7
+    assert first.variant == "specified in RFC 4122"
+    assert first < second
+    assert abs((first.int >> 80) - time.time() * 1000) < 1000
+
+def test_message_write_only_columns_deferred():
+    """Loading a Message skips the columns nothing reads back."""
+    from sqlalchemy import select
+    
+    sql = str(select(Message))
+    assert "messages.body" in sql
+    for column in ("cost", "headers", "error_message", "failed_at"):
+        assert f"messages.{column}" not in sql
@@ -58,3 +58,140 @@ async def test_health_monitor():
     monitor.register_check("fail", fail_check)
     result = await monitor.check_health()
     assert result["status"] == "unhealthy"
+
+@pytest.mark.asyncio
+async def test_correlation_id_middleware_preserves_duplicate_headers():
+    """Repeated response headers (e.g. Set-Cookie) must survive the middleware."""
+    from app.core.observability import CorrelationIdMiddleware
+
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"set-cookie", b"a=1"), (b"set-cookie", b"b=2")],
+        })
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await CorrelationIdMiddleware(app)({"type": "http"}, None, send)
+
+    headers = sent[0]["headers"]
+    assert [v for k, v in headers if k == b"set-cookie"] == [b"a=1", b"b=2"]
+    assert any(k == b"x-correlation-id" for k, _ in headers)
+
+@pytest.mark.asyncio
+async def test_health_monitor_reports_raising_check():
+    """A check that raises marks only itself unhealthy; the others still run."""
+    monitor = HealthMonitor()
+
+    async def ok_check():
+        return True
+
+    async def broken_check():
+        raise RuntimeError("boom")
+
+    monitor.register_check("ok", ok_check)
+    monitor.register_check("broken", broken_check)
+
+    result = await monitor.check_health()
+    assert result["status"] == "unhealthy"
+    assert result["checks"]["ok"]["status"] == "healthy"
+    assert result["checks"]["broken"] == {"status": "unhealthy", "error": "boom"}
+
+@pytest.mark.asyncio
+async def test_health_monitor_reports_cancelled_check():
+    """A check that ends in CancelledError is reported unhealthy, not healthy."""
+    import asyncio
+    monitor = HealthMonitor()
+
+    async def cancelled_check():
+        raise asyncio.CancelledError()
+
+    monitor.register_check("cancelled", cancelled_check)
+
+    result = await monitor.check_health()
+    assert result["status"] == "unhealthy"
+    assert result["checks"]["cancelled"]["status"] == "unhealthy"
+    assert "result" not in result["checks"]["cancelled"]
+
+@pytest.mark.asyncio
+async def test_correlation_id_bound_only_during_request():
+    """The correlation ID is visible to log processors only while the request runs."""
+    from app.core.observability import CorrelationIdMiddleware, add_correlation_id
+
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen.update(add_correlation_id(None, "info", {}))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await CorrelationIdMiddleware(app)({"type": "http"}, None, send)
+
+    header_value = dict(sent[0]["headers"])[b"x-correlation-id"].decode()
+    assert seen["correlation_id"] == header_value
+    assert add_correlation_id(None, "info", {})["correlation_id"] == "-"
+
+def test_pool_metrics_read_at_scrape_time():
+    """Connection pool gauges are filled from the engine pool when metrics are rendered."""
+    pool = Mock()
+    pool.checkedout.return_value = 3
+    pool.checkedin.return_value = 7
+    pool.overflow.return_value = 0
+
+    with patch("app.db.session.db_manager.engine", Mock(pool=pool)):
+        payload, _ = MetricsCollector.get_metrics(max_age=0)
+        output = payload.decode()
+
+    assert 'database_connection_pool_size{metric_type="active"} 3.0' in output
+    assert 'database_connection_pool_size{metric_type="idle"} 7.0' in output
+
+
+def test_get_metrics_reuses_recent_render():
+    """A render within max_age is served from cache with a stable ETag."""
+    first_payload, first_etag = MetricsCollector.get_metrics(max_age=0)
+
+    with patch("app.core.observability.generate_latest") as mock_render:
+        payload, etag = MetricsCollector.get_metrics(max_age=60)
+
+    mock_render.assert_not_called()
+    assert payload == first_payload
+    assert etag == first_etag
+
+def test_correlation_id_middleware_wraps_request_middleware():
+    """Request logs and responses built by RequestMiddleware see the correlation ID."""
+    from app.core.observability import CorrelationIdMiddleware
+    from app.main import app, RequestMiddleware
+
+    # user_middleware lists the outermost middleware first
+    classes = [m.cls for m in app.user_middleware]
+    assert classes.index(CorrelationIdMiddleware) < classes.index(RequestMiddleware)
+
+def test_setup_logging_reapplies_changed_settings():
+    """A second setup applies the current log settings instead of warning and keeping the first."""
+    import logging
+    import warnings
+    import structlog
+    from app.core.observability import setup_logging, settings
+
+    original_level = settings.log_level
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            settings.log_level = "INFO"
+            setup_logging()
+            settings.log_level = "ERROR"
+            setup_logging()
+
+        wrapper = structlog.get_config()["wrapper_class"]
+        assert wrapper is structlog.make_filtering_bound_logger(logging.ERROR)
+    finally:
+        settings.log_level = original_level
+        setup_logging()
@@ -1,8 +1,8 @@
 
+import time
 import pytest
 from unittest.mock import Mock, AsyncMock, patch
 from datetime import datetime
-from tenacity import RetryError
 
 from app.providers.base import (
     ProviderFactory, ProviderSelector, TwilioProvider, SendGridProvider,
@@ -60,8 +60,8 @@ async def test_twilio_provider_send_message():
     with patch("app.core.config.settings.provider_error_rate", 1.0), \
          patch("app.core.config.settings.provider_429_rate", 1.0):
         
-        # Depending on configuration, it might raise ProviderRateLimitError directly or wrapped in RetryError
-        with pytest.raises((ProviderRateLimitError, RetryError)):
+        # Rate limits are not retried in-process; the caller reschedules
+        with pytest.raises(ProviderRateLimitError):
              await provider.send_message(message_data)
 
 @pytest.mark.asyncio
@@ -111,3 +111,59 @@ async def test_provider_selector():
     # Email
     provider = await ProviderSelector.select_provider(MessageType.EMAIL)
     assert isinstance(provider, SendGridProvider)
+
+@pytest.mark.asyncio
+async def test_provider_selector_uses_cached_health(cleanup_providers):
+    """Test select_provider reads cached health instead of checking per call."""
+    await ProviderFactory.init_providers()
+    provider = ProviderFactory.get_provider(MessageType.SMS)
+    
+    with patch.object(provider, "health_check", new=AsyncMock(return_value=True)) as mock_check:
+        await ProviderSelector.select_provider(MessageType.SMS)
+        mock_check.assert_not_called()
+        
+        # A stale entry is refreshed on demand
+        stale = time.monotonic() - settings.provider_health_max_age - 1
+        ProviderFactory._health["twilio"] = (True, stale)
+        await ProviderSelector.select_provider(MessageType.SMS)
+        mock_check.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_providers_share_http_client(cleanup_providers):
+    """Test providers reuse one HTTP client and close_providers closes it."""
+    twilio = TwilioProvider()
+    sendgrid = SendGridProvider()
+    assert twilio.client is sendgrid.client
+    
+    await ProviderFactory.close_providers()
+    assert twilio.client.is_closed
+    assert not TwilioProvider().client.is_closed
+
+@pytest.mark.asyncio
+async def test_provider_message_ids_unique_and_ordered():
+    """Test mock provider message ids are unique and sort by send time."""
+    provider = TwilioProvider()
+    message_data = {"from": "+1234567890", "to": "+0987654321", "type": "sms", "body": "Test"}
+    
+    ids = [(await provider.send_message(message_data))["provider_message_id"] for _ in range(5)]
+    
+    assert len(set(ids)) == 5
+    assert all(i.startswith("twilio_") for i in ids)
+    assert [i[:23] for i in ids] == sorted(i[:23] for i in ids)
+
+@pytest.mark.asyncio
+async def test_provider_send_retries_server_errors():
+    """Test 5xx errors are retried before being raised."""
+    provider = SendGridProvider()
+    message_data = {"from": "from@example.com", "to": "to@example.com", "body": "Test"}
+    
+    with patch("app.core.config.settings.provider_error_rate", 1.0), \
+         patch("app.core.config.settings.provider_429_rate", 0.0), \
+         patch("app.core.config.settings.provider_500_rate", 1.0), \
+         patch("app.core.config.settings.mock_simulate_latency", False), \
+         patch("app.providers.base.asyncio.sleep", new=AsyncMock()) as mock_sleep:
+        with pytest.raises(ProviderServerError):
+            await provider.send_message(message_data)
+    
+    # Three attempts, so two backoffs between them
+    assert [call.args[0] for call in mock_sleep.await_args_list] == [4, 4]
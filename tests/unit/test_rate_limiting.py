@@ -3,33 +3,28 @@ Unit tests for API rate limiting functionality.
 """
 
 import pytest
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch, AsyncMock, Mock
+from redis.exceptions import RedisError
 from app.db.redis import RedisManager
 
 
+def _manager_with_window_count(count):
+    """RedisManager whose rate limit script reports count requests in the window."""
+    redis_manager = RedisManager()
+    redis_manager.redis_client = Mock()
+    script = AsyncMock(return_value=count)
+    redis_manager.redis_client.register_script = Mock(return_value=script)
+    return redis_manager, script
+
+
 @pytest.mark.asyncio
 class TestRateLimiting:
     """Test rate limiting functionality."""
     
     async def test_rate_limit_check_allowed(self):
         """Test rate limit allows requests within limit."""
-        redis_manager = RedisManager()
-        redis_manager.redis_client = AsyncMock()
-        
-        # Mock Redis time to return current timestamp
-        redis_manager.redis_client.time = AsyncMock(return_value=(1609459200, 0))
-        
-        # Mock pipeline operations
-        mock_pipeline = AsyncMock()
-        mock_pipeline.zremrangebyscore = AsyncMock()
-        mock_pipeline.zadd = AsyncMock()
-        mock_pipeline.zcard = AsyncMock()
-        mock_pipeline.expire = AsyncMock()
-        mock_pipeline.execute = AsyncMock(return_value=[None, None, 5, None])  # 5 requests
+        redis_manager, _ = _manager_with_window_count(5)
         
-        redis_manager.redis_client.pipeline = lambda: mock_pipeline
-        
-        # Check rate limit
         allowed, remaining = await redis_manager.check_rate_limit(
             key="test:client:endpoint",
             limit=100,
@@ -37,27 +32,12 @@ class TestRateLimiting:
         )
         
         assert allowed is True
-        assert remaining == 95  # 100 - 5
+        assert remaining == 95
     
     async def test_rate_limit_check_exceeded(self):
         """Test rate limit blocks requests exceeding limit."""
-        redis_manager = RedisManager()
-        redis_manager.redis_client = AsyncMock()
-        
-        # Mock Redis time
-        redis_manager.redis_client.time = AsyncMock(return_value=(1609459200, 0))
-        
-        # Mock pipeline operations
-        mock_pipeline = AsyncMock()
-        mock_pipeline.zremrangebyscore = AsyncMock()
-        mock_pipeline.zadd = AsyncMock()
-        mock_pipeline.zcard = AsyncMock()
-        mock_pipeline.expire = AsyncMock()
-        mock_pipeline.execute = AsyncMock(return_value=[None, None, 101, None])  # 101 requests
+        redis_manager, _ = _manager_with_window_count(101)
         
-        redis_manager.redis_client.pipeline = lambda: mock_pipeline
-        
-        # Check rate limit
         allowed, remaining = await redis_manager.check_rate_limit(
             key="test:client:endpoint",
             limit=100,
@@ -68,24 +48,9 @@ class TestRateLimiting:
         assert remaining == 0
     
     async def test_rate_limit_check_at_limit(self):
-        """Test rate limit at exact limit."""
-        redis_manager = RedisManager()
-        redis_manager.redis_client = AsyncMock()
-        
-        # Mock Redis time
-        redis_manager.redis_client.time = AsyncMock(return_value=(1609459200, 0))
-        
-        # Mock pipeline operations
-        mock_pipeline = AsyncMock()
-        mock_pipeline.zremrangebyscore = AsyncMock()
-        mock_pipeline.zadd = AsyncMock()
-        mock_pipeline.zcard = AsyncMock()
-        mock_pipeline.expire = AsyncMock()
-        mock_pipeline.execute = AsyncMock(return_value=[None, None, 100, None])  # Exactly at limit
+        """Test rate limit at exact limit boundary."""
+        redis_manager, _ = _manager_with_window_count(100)
         
-        redis_manager.redis_client.pipeline = lambda: mock_pipeline
-        
-        # Check rate limit
         allowed, remaining = await redis_manager.check_rate_limit(
             key="test:client:endpoint",
             limit=100,
@@ -95,14 +60,10 @@ class TestRateLimiting:
         assert allowed is True
         assert remaining == 0
     
-    @pytest.mark.skip(reason="Fails to catch exception in mock")
     async def test_rate_limit_redis_failure_fail_open(self):
         """Test rate limit fails open when Redis is unavailable."""
-        redis_manager = RedisManager()
-        redis_manager.redis_client = AsyncMock()
-        
-        # Mock Redis time to raise exception
-        redis_manager.redis_client.time = AsyncMock(side_effect=Exception("Redis unavailable"))
+        redis_manager, script = _manager_with_window_count(0)
+        script.side_effect = RedisError("Redis unavailable")
         
         # Check rate limit - should fail open (allow request)
         allowed, remaining = await redis_manager.check_rate_limit(
@@ -115,34 +76,198 @@ class TestRateLimiting:
         assert remaining == 100  # Returns full limit on error
 
     async def test_rate_limit_sliding_window(self):
-        """Test rate limit uses sliding window."""
-        redis_manager = RedisManager()
-        redis_manager.redis_client = AsyncMock()
-        
-        now_sec = 1609459200
-        redis_manager.redis_client.time = AsyncMock(return_value=(now_sec, 0))
+        """Test the window is evaluated by one script call, registered once."""
+        redis_manager, script = _manager_with_window_count(10)
         
-        mock_pipeline = AsyncMock()
-        mock_pipeline.zremrangebyscore = AsyncMock()
-        mock_pipeline.zadd = AsyncMock()
-        mock_pipeline.zcard = AsyncMock()
-        mock_pipeline.expire = AsyncMock()
-        mock_pipeline.execute = AsyncMock(return_value=[None, None, 10, None])
+        for _ in range(2):
+            await redis_manager.check_rate_limit(
+                key="test:client:endpoint",
+                limit=100,
+                window=60
+            )
         
-        redis_manager.redis_client.pipeline = lambda: mock_pipeline
+        redis_manager.redis_client.register_script.assert_called_once()
+        assert script.await_count == 2
+        script.assert_awaited_with(keys=["test:client:endpoint"], args=[60000, 1])
+
+    async def test_rate_limit_records_batched_hits(self):
+        """Test batched hits are all recorded in the sliding window."""
+        redis_manager, script = _manager_with_window_count(80)
         
-        # Check rate limit
-        await redis_manager.check_rate_limit(
+        allowed, remaining = await redis_manager.check_rate_limit(
             key="test:client:endpoint",
             limit=100,
-            window=60
+            window=60,
+            hits=80
         )
         
-        # Verify old entries are removed (sliding window)
-        now_ms = now_sec * 1000
-        window_ms = 60 * 1000
-        mock_pipeline.zremrangebyscore.assert_called_once()
-        
-        # Verify expiry is set
-        mock_pipeline.expire.assert_called_once()
+        assert allowed is True
+        assert remaining == 20
+        assert script.call_args.kwargs["args"] == [60000, 80]
+
 
+async def _send_through_middleware(path, client=("10.0.0.1", 50000)):
+    """Run one GET through RequestMiddleware; return (status, headers)."""
+    from fastapi import Response
+    import app.main as main
+    
+    scope = {"type": "http", "method": "GET", "path": path, "client": client, "headers": []}
+    messages = []
+    
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        messages.append(message)
+    
+    await main.RequestMiddleware(Response())(scope, receive, send)
+    start = messages[0]
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}
+
+
+@pytest.mark.asyncio
+class TestLocalRateLimitPrecheck:
+    """Test the in-process pre-check in the request middleware."""
+    
+    async def test_redis_consulted_only_near_limit(self):
+        """Requests below the local threshold skip Redis; crossing it syncs the count."""
+        import app.main as main
+        
+        with patch.object(main, "_RL_ENABLED", True), \
+             patch.object(main, "_local_rate_counts", {}), \
+             patch.object(main.redis_manager, "check_rate_limit",
+                          new=AsyncMock(return_value=(True, 10))) as mock_check:
+            for _ in range(main._RL_LOCAL_THRESHOLD - 1):
+                status, headers = await _send_through_middleware("/test-local-precheck")
+            
+            mock_check.assert_not_called()
+            assert status == 200
+            assert headers["x-ratelimit-remaining"] == str(
+                main._RL_LIMIT - main._RL_LOCAL_THRESHOLD + 1
+            )
+            
+            await _send_through_middleware("/test-local-precheck")
+            
+            mock_check.assert_awaited_once()
+            assert mock_check.call_args.kwargs["hits"] == main._RL_LOCAL_THRESHOLD
+    
+    async def test_workers_together_stay_within_limit(self):
+        """Workers' local allowances together stay under the shared limit."""
+        import app.main as main
+        
+        workers = 4
+        threshold = main._local_threshold(workers)
+        assert workers * threshold <= main._RL_LIMIT * 0.8
+        
+        redis_hits = 0
+        
+        async def shared_window(key, limit, window, hits):
+            nonlocal redis_hits
+            redis_hits += hits
+            return redis_hits <= limit, max(limit - redis_hits, 0)
+        
+        worker_counts = [{} for _ in range(workers)]
+        admitted = 0
+        with patch.object(main, "_RL_LOCAL_THRESHOLD", threshold), \
+             patch.object(main.redis_manager, "check_rate_limit",
+                          new=AsyncMock(side_effect=shared_window)):
+            # One client spread round-robin over every worker process
+            for i in range(2 * main._RL_LIMIT):
+                with patch.object(main, "_local_rate_counts", worker_counts[i % workers]):
+                    allowed, _ = await main._check_rate_limit("10.0.0.9", "/api/v1/messages/")
+                admitted += allowed
+        
+        assert admitted <= main._RL_LIMIT
+    
+    async def test_single_process_keeps_full_allowance(self):
+        """Without WEB_CONCURRENCY (plain uvicorn, debug) one process gets the whole share."""
+        import app.main as main
+        
+        with patch.dict("os.environ", {}, clear=True):
+            assert main._server_workers() == 1
+        with patch.dict("os.environ", {"WEB_CONCURRENCY": "4"}):
+            assert main._server_workers() == 4
+        assert main._local_threshold(1) == int(main._RL_LIMIT * 0.8)
+    
+    async def test_window_rollover_reports_unsynced_hits(self):
+        """Hits left unreported when a local window expires reach Redis, and the next window stays on Redis."""
+        import app.main as main
+        
+        now = 1000.0
+        with patch.object(main, "_local_rate_counts", {}), \
+             patch.object(main, "time") as mock_time, \
+             patch.object(main.redis_manager, "check_rate_limit",
+                          new=AsyncMock(return_value=(False, 0))) as mock_check:
+            mock_time.monotonic.side_effect = lambda: now
+            for _ in range(main._RL_LOCAL_THRESHOLD - 1):
+                allowed, _ = await main._check_rate_limit("10.0.0.7", "/api/v1/messages/")
+                assert allowed
+            mock_check.assert_not_called()
+            
+            now += main._RL_WINDOW
+            admitted = 0
+            for _ in range(main._RL_LOCAL_THRESHOLD):
+                allowed, _ = await main._check_rate_limit("10.0.0.7", "/api/v1/messages/")
+                admitted += allowed
+        
+        assert admitted == 0
+        assert mock_check.await_args_list[0].kwargs["hits"] == main._RL_LOCAL_THRESHOLD
+        assert sum(c.kwargs["hits"] for c in mock_check.await_args_list) == \
+            2 * main._RL_LOCAL_THRESHOLD - 1
+    
+    async def test_local_remaining_assumes_other_processes_used_their_share(self):
+        """With several processes the local path never overstates what is left."""
+        import app.main as main
+        
+        processes = 4
+        threshold = main._local_threshold(processes)
+        with patch.object(main, "_local_rate_counts", {}), \
+             patch.object(main, "_RL_LOCAL_THRESHOLD", threshold), \
+             patch.object(main, "_RL_LOCAL_REMAINING",
+                          main._RL_LIMIT - (processes - 1) * threshold):
+            allowed, remaining = await main._check_rate_limit("10.0.0.8", "/api/v1/messages/")
+        
+        assert allowed
+        assert remaining == main._RL_LIMIT - (processes - 1) * threshold - 1
+    
+    async def test_full_table_evicts_oldest_windows(self):
+        """At the key cap the oldest windows are dropped; newer clients keep their counts."""
+        import app.main as main
+        
+        counts = {}
+        with patch.object(main, "_local_rate_counts", counts), \
+             patch.object(main, "_RL_LOCAL_MAX_KEYS", 4), \
+             patch.object(main, "_RL_LOCAL_EVICT", 2):
+            for key in ("a", "b", "c", "d"):
+                main._count_local_request(key, 0.0)
+            main._count_local_request("d", 0.0)
+            main._count_local_request("e", 0.0)
+        
+        assert list(counts) == ["c", "d", "e"]
+        assert counts["d"][0] == 2
+    
+    async def test_rejected_request_gets_429(self):
+        """A request Redis rejects gets the prebuilt 429 without reaching the app."""
+        import app.main as main
+        
+        with patch.object(main, "_RL_ENABLED", True), \
+             patch.object(main, "_local_rate_counts", {}), \
+             patch.object(main, "_RL_LOCAL_THRESHOLD", 0), \
+             patch.object(main.redis_manager, "check_rate_limit",
+                          new=AsyncMock(return_value=(False, 0))):
+            status, headers = await _send_through_middleware("/api/v1/messages/")
+        
+        assert status == 429
+        assert headers["x-ratelimit-remaining"] == "0"
+        assert headers["x-ratelimit-limit"] == main._RL_LIMIT_HEADER
+    
+    async def test_probe_paths_not_rate_limited(self):
+        """Health and metrics paths never reach the rate limiter."""
+        import app.main as main
+        
+        with patch.object(main, "_RL_ENABLED", True), \
+             patch.object(main.redis_manager, "check_rate_limit", new=AsyncMock()) as mock_check:
+            status, headers = await _send_through_middleware("/metrics")
+        
+        mock_check.assert_not_called()
+        assert "x-ratelimit-limit" not in headers